@@ -0,0 +1,181 @@
+import os
+import math
+import time
+import asyncio
+import threading
+
+from llm_scheduler import INTERACTIVE, PRIORITY_NAMES
+from instrumentation import registry
+
+
+ADMISSION_DECISIONS = registry.counter(
+    "vidya_admission_decisions_total", "Requests admitted, queued first, or shed by admission control",
+    ("priority", "outcome"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted within its wait budget"""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        """Response headers telling the client when to try again"""
+        return {"Retry-After": str(math.ceil(self.retry_after))}
+
+
+class AdmissionController:
+    """Caps the model calls in flight across every app in the process.
+
+    Each admitted request holds its endpoint's estimated number of model
+    calls until its response has been sent. Interactive requests may use the
+    whole `budget`; everything else stops at `budget * (1 - reserve)`, so a
+    burst of batch generations always leaves room for chat and canvas.
+    Requests that don't fit wait up to `max_wait` seconds, then are shed.
+    """
+
+    def __init__(self, budget=24, reserve=0.25, max_wait=2.0):
+        self.budget = budget
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiting = {}  # priority -> number of queued requests
+        self._changed = None
+        # Seconds per model call, smoothed over finished requests, for Retry-After
+        self._seconds_per_call = 2.0
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def _limit(self, priority):
+        return self.budget if priority == INTERACTIVE else self.budget * (1 - self.reserve)
+
+    def _fits(self, cost, priority):
+        # Queued interactive requests go first
+        if priority != INTERACTIVE and self._waiting.get(INTERACTIVE):
+            return False
+        # An idle process admits anything, even a request costing more than its limit
+        return self.in_flight == 0 or self.in_flight + cost <= self._limit(priority)
+
+    def retry_after(self, cost, priority):
+        excess = max(self.in_flight + cost - self._limit(priority), 1)
+        return min(max(excess * self._seconds_per_call, 1.0), 60.0)
+
+    async def acquire(self, cost, priority):
+        """Wait for room for `cost` model calls; raises AdmissionRejected after `max_wait`"""
+        if not self.budget:
+            return
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        if not self._fits(cost, priority):
+            self._stats["queued"] += 1
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: self._fits(cost, priority)), self.max_wait
+                    )
+            except asyncio.TimeoutError:
+                self._stats["rejected"] += 1
+                ADMISSION_DECISIONS.inc(priority=name, outcome="rejected")
+                raise AdmissionRejected(
+                    f"Server is busy with {self.in_flight} model calls in flight; try again shortly",
+                    self.retry_after(cost, priority)
+                )
+            finally:
+                self._waiting[priority] -= 1
+            ADMISSION_DECISIONS.inc(priority=name, outcome="queued")
+        else:
+            ADMISSION_DECISIONS.inc(priority=name, outcome="admitted")
+        self.in_flight += cost
+        self._stats["admitted"] += 1
+
+    async def release(self, cost, seconds):
+        if not self.budget:
+            return
+        self.in_flight -= cost
+        if cost:
+            self._seconds_per_call = 0.8 * self._seconds_per_call + 0.2 * (seconds / cost)
+        if self._changed is not None:
+            async with self._changed:
+                self._changed.notify_all()
+
+    def stats(self):
+        return dict(self._stats, in_flight=self.in_flight, budget=self.budget,
+                    waiting=sum(self._waiting.values()))
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests by their endpoint's estimated model calls.
+
+    `costs` maps (method, path) to (model calls, priority); other requests
+    pass straight through. The cost is held until the whole response,
+    including a streamed body, has been sent.
+    """
+
+    def __init__(self, app, costs, controller=None):
+        self.app = app
+        self.costs = costs
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        # Under the gateway the mount prefix is in root_path (and, on newer Starlette, in path too)
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):] or "/"
+        cost = self.costs.get((scope["method"], path))
+        if cost is None:
+            await self.app(scope, receive, send)
+            return
+
+        calls, priority = cost
+        controller = self.controller or get_admission_controller()
+        try:
+            await controller.acquire(calls, priority)
+        except AdmissionRejected as e:
+            from fastapi.responses import JSONResponse
+            response = JSONResponse({"detail": str(e)}, status_code=503, headers=e.headers)
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await controller.release(calls, time.perf_counter() - started)
+
+
+def admit_requests(app, costs):
+    """Put a FastAPI app's expensive endpoints behind the shared admission controller.
+
+    Call it before adding CORS, so shed requests still get CORS headers, and
+    list Retry-After in the CORS `expose_headers` so the browser can read it.
+    """
+    app.add_middleware(AdmissionMiddleware, costs=costs)
+    return app
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Process-wide controller, so mounted services share one budget.
+
+    ADMISSION_BUDGET (0 disables), ADMISSION_INTERACTIVE_RESERVE and
+    ADMISSION_MAX_WAIT configure it.
+    """
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    budget=int(os.getenv("ADMISSION_BUDGET", "24")),
+                    reserve=float(os.getenv("ADMISSION_INTERACTIVE_RESERVE", "0.25")),
+                    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+                )
+    return _controller
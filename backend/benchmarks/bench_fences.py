@@ -0,0 +1,84 @@
+"""Compare the old regex + rfind code extraction with the single-pass fence tokenizer.
+
+Run from the backend directory:
+
+    python benchmarks/bench_fences.py [--blocks 200] [--lines 40] [--repeat 5]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_fences import split_markdown
+
+
+LEGACY_PATTERN = re.compile(r'```(?:python|java|javascript|cpp|c|html|css)?\n(.*?)```', re.DOTALL)
+
+
+def legacy_extract(text):
+    """The extraction generate_optimized_code used before the tokenizer"""
+    code_matches = LEGACY_PATTERN.findall(text)
+    explanation = None
+    if code_matches:
+        last_code = code_matches[-1]
+        last_code_pos = text.rfind(last_code) + len(last_code) + 3
+        if last_code_pos < len(text):
+            explanation = text[last_code_pos:].strip()
+    return code_matches, explanation
+
+
+def tokenizer_extract(text):
+    blocks, prose = split_markdown(text)
+    return [block["code"] for block in blocks], prose[-1].strip()
+
+
+def build_output(blocks, lines):
+    """Synthetic model output: prose and code blocks, with some repeated block bodies"""
+    languages = ["python", "javascript", "rust", "go", "java", "typescript"]
+    parts = []
+    for i in range(blocks):
+        parts.append(f"Step {i}: here is how the next part works. " * 5 + "\n\n")
+        if i % 5 == 0:
+            body = "def helper():\n    return 42\n"
+        else:
+            body = "".join(f"value_{i}_{n} = compute({i}, {n})\n" for n in range(lines))
+        parts.append(f"```{languages[i % len(languages)]}\n{body}```\n\n")
+    # The explanation quotes the last block, which fools the rfind-based search
+    parts.append("That's the whole solution. The helper is simply:\n"
+                 "def helper():\n    return 42\n")
+    return "".join(parts)
+
+
+def bench(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = build_output(args.blocks, args.lines)
+    legacy_blocks, legacy_explanation = legacy_extract(text)
+    blocks, explanation = tokenizer_extract(text)
+    expected = text[text.rindex("That's the whole solution"):].strip()
+
+    print(f"Output size: {len(text) / 1024:.1f} KiB, {args.blocks} fenced blocks")
+    print(f"legacy regex : {bench(legacy_extract, text, args.repeat) * 1000:8.2f} ms, "
+          f"{len(legacy_blocks)} blocks found, explanation correct: {legacy_explanation == expected}")
+    print(f"tokenizer    : {bench(tokenizer_extract, text, args.repeat) * 1000:8.2f} ms, "
+          f"{len(blocks)} blocks found, explanation correct: {explanation == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Load-test the backend services offline against a deterministic mock LLM.
+
+Each service is started in its own process through mock_services.py, so
+Gemini, CrewAI and Serper calls are answered locally with a fixed latency.
+Run from the backend directory:
+
+    python benchmarks/bench_services.py [--services chatbot canvas] [--concurrency 1 8 32]
+        [--requests 64] [--latency 0.05] [--output-chars 400] [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from io import BytesIO
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_services import SERVICES
+
+
+def blank_canvas():
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (400, 200), "black").save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def payload(service, i, canvas_image=None):
+    """Request body for the i-th request; topics vary so requests aren't coalesced"""
+    if service == "chatbot":
+        return {"query": f"Can you explain topic number {i}?", "api_key": f"bench-user-{i % 16}"}
+    if service == "code_generator":
+        return {"prompt": f"Write a function that sorts list number {i}", "mode": "auto"}
+    if service == "resource_generator":
+        return {"topic": f"benchmark topic {i}"}
+    if service == "sos_exam_prep":
+        return {"topic": f"benchmark topic {i}", "aid_type": "cheat sheet"}
+    return {"image": canvas_image, "dict_of_vars": {}, "action": "Mathematics"}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def memory_kb(pid):
+    """Current and peak RSS of a process in KiB, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["VmHWM"].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def start_service(service, args, workdir):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_services.py"),
+               service, "--latency", str(args.latency), "--output-chars", str(args.output_chars)]
+    log = open(os.path.join(workdir, f"{service}.log"), "w")
+    # A scratch working directory keeps memory files and SQLite databases out of the tree
+    return subprocess.Popen(command, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_until_ready(client, base_url, process, ready_path="/", timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"service exited with code {process.returncode}")
+        try:
+            if (await client.get(base_url + ready_path)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("service did not become ready in time")
+
+
+async def run_level(client, service, url, concurrency, total, canvas_image):
+    latencies, errors = [], 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with gate:
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload(service, i, canvas_image))
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def bench_service(service, args, workdir, canvas_image):
+    _, port, _, path, ready_path = SERVICES[service]
+    base_url = f"http://localhost:{port}"
+    process = start_service(service, args, workdir)
+    results = []
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout) as client:
+            await wait_until_ready(client, base_url, process, ready_path)
+            idle_rss, _ = memory_kb(process.pid)
+            for concurrency in args.concurrency:
+                level = await run_level(client, service, base_url + path, concurrency,
+                                        args.requests, canvas_image)
+                level["rss_kb"], level["peak_rss_kb"] = memory_kb(process.pid)
+                level["idle_rss_kb"] = idle_rss
+                results.append(level)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+def print_table(service, results):
+    print(f"\n{service}")
+    print(f"{'conc':>5} {'reqs':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>8} {'rss MiB':>8} {'peak MiB':>9}")
+    for r in results:
+        rss = f"{r['rss_kb'] / 1024:.1f}" if r["rss_kb"] else "n/a"
+        peak = f"{r['peak_rss_kb'] / 1024:.1f}" if r["peak_rss_kb"] else "n/a"
+        print(f"{r['concurrency']:>5} {r['requests']:>5} {r['errors']:>4} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+              f"{r['p99_ms']:>9} {r['throughput_rps']:>8} {rss:>8} {peak:>9}")
+
+
+async def main_async(args):
+    canvas_image = blank_canvas() if "canvas" in args.services else None
+    report = {"latency": args.latency, "output_chars": args.output_chars, "services": {}}
+    with tempfile.TemporaryDirectory(prefix="vidya-bench-") as workdir:
+        for service in args.services:
+            try:
+                results = await bench_service(service, args, workdir, canvas_image)
+            except RuntimeError as e:
+                print(f"\n{service}: {e} (see {service}.log)")
+                with open(os.path.join(workdir, f"{service}.log")) as f:
+                    print(f.read()[-2000:])
+                continue
+            report["services"][service] = results
+            print_table(service, results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICES), default=sorted(SERVICES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per model call")
+    parser.add_argument("--output-chars", type=int, default=400, help="mock reply size")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-request timeout")
+    parser.add_argument("--json", help="also write the results to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
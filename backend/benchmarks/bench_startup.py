@@ -0,0 +1,101 @@
+"""Measure how long each service takes to import and build its app.
+
+Each service is imported in a fresh interpreter under `python -X importtime`,
+the way a new uvicorn worker would load it. Run from the backend directory:
+
+    python benchmarks/bench_startup.py [--services chatbot canvas] [--repeat 5] [--top 5]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_services import BACKEND_DIR, SERVICES
+
+
+# SDKs that should only load once a request needs them
+HEAVY_MODULES = ("crewai", "crewai_tools", "litellm", "google.generativeai", "PIL")
+
+LOADER = """
+import importlib.util, sys, time
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location({name!r}, {path!r})
+module = importlib.util.module_from_spec(spec)
+sys.modules[{name!r}] = module
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.create_app()
+print(f"{{imported - started}} {{time.perf_counter() - imported}}")
+"""
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative_us} for top-level imports, plus every module name seen"""
+    top_level, seen = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        seen.add(name.strip())
+        # Nested imports are indented under the module that pulled them in
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, seen
+
+
+def measure(service, workdir):
+    filename = SERVICES[service][0]
+    code = LOADER.format(backend=BACKEND_DIR, name=filename.split(".py")[0],
+                         path=os.path.join(BACKEND_DIR, filename))
+    env = dict(os.environ, GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "bench-key"),
+               SERPER_API_KEY=os.getenv("SERPER_API_KEY", "bench-key"))
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir, env=env,
+                             capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "failed")
+    import_seconds, factory_seconds = map(float, process.stdout.strip().splitlines()[-1].split())
+    top_level, seen = parse_importtime(process.stderr)
+    return {
+        "wall": wall,
+        "import": import_seconds,
+        "factory": factory_seconds,
+        "top_level": top_level,
+        "heavy": sorted(m for m in HEAVY_MODULES if m in seen),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICES), default=sorted(SERVICES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest top-level imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="vidya-startup-") as workdir:
+        for service in args.services:
+            try:
+                runs = [measure(service, workdir) for _ in range(args.repeat)]
+            except RuntimeError as e:
+                print(f"\n{service}: could not import ({e})")
+                continue
+            last = runs[-1]
+            print(f"\n{service}")
+            print(f"  process wall : {statistics.median(r['wall'] for r in runs) * 1000:8.1f} ms (median of {len(runs)})")
+            print(f"  module import: {statistics.median(r['import'] for r in runs) * 1000:8.1f} ms")
+            print(f"  create_app() : {statistics.median(r['factory'] for r in runs) * 1000:8.1f} ms")
+            print(f"  heavy SDKs loaded at import: {', '.join(last['heavy']) or 'none'}")
+            heaviest = sorted(last["top_level"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+            for name, cumulative in heaviest:
+                print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
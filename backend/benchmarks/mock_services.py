@@ -0,0 +1,177 @@
+"""Run one backend service with every model and search call answered locally.
+
+Used by bench_services.py, but also handy on its own for poking at a service
+without API keys. Run from the backend directory:
+
+    python benchmarks/mock_services.py chatbot [--latency 0.05] [--output-chars 400]
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import argparse
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+# name -> (file, port, method, path, readiness path)
+SERVICES = {
+    "chatbot": ("chatbot.py", 8001, "POST", "/chat", "/"),
+    "code_generator": ("code_generator.py", 8008, "POST", "/generate-code/", "/health/"),
+    "resource_generator": ("resource_generator.py", 8000, "POST", "/generate-resources", "/"),
+    "sos_exam_prep": ("sos_exam_prep.py.py", 8006, "POST", "/generate-study-aid", "/"),
+    "canvas": ("canvas.py", 8900, "POST", "/calculate", "/"),
+}
+
+MOCK_RESOURCES = {
+    "learning_plan": "Start with the fundamentals, then practice with projects.",
+    "books": [{"title": f"Book {i}", "author": "A. Author", "description": "A solid text."} for i in range(5)],
+    "online_courses": [{"platform": "Coursera", "course_name": f"Course {i}", "url": "https://www.coursera.org",
+                        "description": "A structured course."} for i in range(5)],
+    "websites": [{"name": f"Site {i}", "url": "https://example.com", "description": "Good reference."} for i in range(5)],
+    "youtube_channels": [{"channel_name": f"Channel {i}", "url": "https://youtube.com",
+                          "description": "Clear explanations."} for i in range(5)],
+}
+
+
+def _pad(text, output_chars):
+    if len(text) >= output_chars:
+        return text
+    filler = "\nMore detail follows here."
+    return text + filler * ((output_chars - len(text)) // len(filler) + 1)
+
+
+def mock_reply(messages, output_chars=400):
+    """A canned reply shaped like what the prompt asks for"""
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    if '"learning_plan"' in prompt:
+        body = json.dumps(MOCK_RESOURCES)
+    elif "Format as valid JSON" in prompt:
+        body = json.dumps(MOCK_RESOURCES["books"])
+    elif '"needs_history"' in prompt:
+        body = json.dumps({"needs_history": True, "needs_facts": True, "history_turns": 3,
+                           "search_terms": ["topic"], "explanation": "Mock decision"})
+    elif "extracted facts" in prompt or "JSON list" in prompt:
+        body = "[]"
+    elif "need web search" in prompt:
+        body = "no"
+    elif "code" in prompt.lower():
+        body = _pad("```python\ndef solution(values):\n    return sorted(values)\n\n\nprint(solution([3, 1, 2]))\n```\n\n"
+                    "The function sorts the input.", output_chars)
+    else:
+        body = _pad("Here is a concise answer to the question.", output_chars)
+    # CrewAI agents parse a ReAct-style reply
+    if "Final Answer:" in prompt:
+        return f"Thought: I now can give a great answer\nFinal Answer: {body}"
+    return body
+
+
+def install_mocks(latency=0.05, output_chars=400):
+    """Answer LLMClient, CrewAI (litellm), Serper and Gemini vision calls locally"""
+    os.environ["LLM_PROVIDER"] = "mock"
+    os.environ["MOCK_LLM_LATENCY"] = str(latency)
+    os.environ["MOCK_LLM_OUTPUT_CHARS"] = str(output_chars)
+    # Benchmarks measure the services, not the rate limiter
+    os.environ.setdefault("LLM_RATE_LIMIT_RPM", "0")
+    os.environ.setdefault("ADMISSION_BUDGET", "0")
+    # Later concurrency levels repeat topics, which the catalog would answer without agents
+    os.environ.setdefault("RESOURCE_CATALOG_DB", "")
+    os.environ.setdefault("GEMINI_API_KEY", "mock-key")
+    os.environ.setdefault("SERPER_API_KEY", "mock-key")
+
+    from llm_client import get_client
+    get_client().provider.responder = lambda model, messages: mock_reply(messages, output_chars)
+
+    try:
+        import asyncio
+        import litellm
+
+        def completion(*args, **kwargs):
+            time.sleep(latency)
+            return litellm.mock_completion(
+                model=kwargs.get("model", "mock"), messages=kwargs.get("messages", []),
+                mock_response=mock_reply(kwargs.get("messages", []), output_chars),
+                stream=kwargs.get("stream", False)
+            )
+
+        async def acompletion(*args, **kwargs):
+            await asyncio.sleep(latency)
+            return litellm.mock_completion(
+                model=kwargs.get("model", "mock"), messages=kwargs.get("messages", []),
+                mock_response=mock_reply(kwargs.get("messages", []), output_chars)
+            )
+
+        litellm.completion = completion
+        litellm.acompletion = acompletion
+    except ImportError:
+        pass
+
+    try:
+        from crewai_tools import SerperDevTool
+
+        def search(self, **kwargs):
+            time.sleep(latency)
+            query = kwargs.get("search_query") or kwargs.get("query") or ""
+            return json.dumps({"organic": [
+                {"title": f"Result {i} for {query}", "link": "https://example.com", "snippet": "Mock snippet."}
+                for i in range(3)
+            ]})
+
+        SerperDevTool._run = search
+    except ImportError:
+        pass
+
+    try:
+        import google.generativeai as genai
+
+        def generate_content(self, contents, *args, **kwargs):
+            time.sleep(latency)
+            prompt = str(contents[0]) if contents else ""
+            if '"missing_value"' in prompt:
+                text = json.dumps({"pattern_type": "number series", "pattern_rules": ["adds 2"],
+                                   "solution_steps": ["Read the series.", "Add 2."], "missing_value": "42",
+                                   "verification": "Every term is 2 more than the last."})
+            elif '"solutions"' in prompt:
+                text = json.dumps({"solutions": [{"expression": "40 + 2", "steps": ["Read the expression.",
+                                                                                     "Evaluate it."],
+                                                  "result": "42", "assign": False}]})
+            else:
+                text = json.dumps({"steps": ["Read the problem.", "Solve it."], "result": "42"})
+            return SimpleNamespace(
+                text=text,
+                usage_metadata=SimpleNamespace(prompt_token_count=300, candidates_token_count=len(text) // 4)
+            )
+
+        genai.GenerativeModel.generate_content = generate_content
+    except ImportError:
+        pass
+
+
+def run_service(name):
+    filename, port, _, _, _ = SERVICES[name]
+    path = os.path.join(BACKEND_DIR, filename)
+    if name == "canvas":
+        # canvas starts uvicorn by import string with reload, so serve its app directly
+        import uvicorn
+        module = runpy.run_path(path, run_name="canvas_bench")
+        uvicorn.run(module["app"], host="localhost", port=port)
+    else:
+        runpy.run_path(path, run_name="__main__")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--output-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    install_mocks(args.latency, args.output_chars)
+    run_service(args.service)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Check that concurrent /chat turns for one user stay in order.
+
+Starts the chatbot offline through mock_services.py, fires bursts of
+concurrent messages for several users at once, then reads each user's
+history back from the chat memory database and verifies that every user
+message is directly followed by its assistant reply. Run from the backend
+directory:
+
+    python benchmarks/stress_chat_order.py [--users 8] [--turns 6] [--latency 0.05]
+"""
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_services import SERVICES
+from bench_services import start_service, wait_until_ready
+
+
+def check_history(rows, expected):
+    """Return a list of problems with one user's (role, content) rows"""
+    problems = []
+    turns = [row for row in rows if row[0] in ("user", "assistant")][1:]  # skip the welcome message
+    users = [content for role, content in turns if role == "user"]
+    if sorted(users) != sorted(expected):
+        problems.append(f"expected {len(expected)} user messages, found {len(users)}")
+    for i in range(0, len(turns), 2):
+        pair = [role for role, _ in turns[i:i + 2]]
+        if pair != ["user", "assistant"]:
+            problems.append(f"turn {i // 2} is {pair}, not a user message followed by its reply")
+            break
+    return problems
+
+
+async def run(args, workdir):
+    _, port, _, path, ready_path = SERVICES["chatbot"]
+    base_url = f"http://localhost:{port}"
+    process = start_service("chatbot", SimpleNamespace(latency=args.latency, output_chars=200), workdir)
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout) as client:
+            await wait_until_ready(client, base_url, process, ready_path)
+
+            async def send(user, turn):
+                response = await client.post(base_url + path, json={
+                    "query": f"message {turn} from {user}", "api_key": user
+                })
+                return response.status_code
+
+            users = [f"stress-user-{i}" for i in range(args.users)]
+            # One warm-up turn per user creates the sessions before the burst
+            await asyncio.gather(*(send(user, "warmup") for user in users))
+            started = time.perf_counter()
+            codes = await asyncio.gather(*(
+                send(user, turn) for turn in range(args.turns) for user in users
+            ))
+            elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except Exception:
+            process.kill()
+
+    failed = sum(1 for code in codes if code != 200)
+    conn = sqlite3.connect(os.path.join(workdir, "chat_memory.db"))
+    problems = {}
+    for user in users:
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE api_key = ? ORDER BY seq", (user,)
+        ).fetchall()
+        expected = [f"message warmup from {user}"] + [f"message {turn} from {user}" for turn in range(args.turns)]
+        user_problems = check_history(rows, expected)
+        if user_problems:
+            problems[user] = user_problems
+
+    print(f"{len(codes)} concurrent turns for {args.users} users in {elapsed:.2f}s "
+          f"({failed} failed requests)")
+    for user, user_problems in problems.items():
+        for problem in user_problems:
+            print(f"  {user}: {problem}")
+    print("history order: " + ("OK" if not problems and not failed else "BROKEN"))
+    return 0 if not problems and not failed else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=6, help="concurrent turns per user")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per model call")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-request timeout")
+    args = parser.parse_args()
+    # Let the whole burst queue up instead of being turned away with 429s
+    os.environ["CHAT_MAX_QUEUED_TURNS"] = str(args.turns + 1)
+    with tempfile.TemporaryDirectory(prefix="vidya-stress-") as workdir:
+        sys.exit(asyncio.run(run(args, workdir)))
+
+
+if __name__ == "__main__":
+    main()
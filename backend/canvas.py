@@ -1,21 +1,40 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import uvicorn
-import google.generativeai as ai
-import re
 import ast
 import json
-from PIL import Image
+import copy
+import math
+import asyncio
 import base64
+import hashlib
+import sqlite3
+import threading
+import operator
+from datetime import datetime
+from typing import Optional
 from io import BytesIO
+from functools import lru_cache
 from dotenv import load_dotenv
 import os
+import time
+import logging
+
+from llm_scheduler import INTERACTIVE, SchedulerTimeout, get_scheduler
+from instrumentation import TRACE_HEADER, instrument_app, record_cache_lookup, record_llm_call
+from admission import admit_requests
+from llm_cache import get_cache
+from canvas_regions import flatten, segment_regions, stack_regions
+from canvas_parsing import (
+    ResponseFormatError, build_repair_prompt, format_instructions, parse_response,
+    response_schema, to_answers
+)
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
 SERVER_URL = 'localhost'
 PORT = '8900'
@@ -23,17 +42,181 @@ ENV = 'dev'
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
 
-ai.configure(api_key=GEMINI_API_KEY)
-model = ai.GenerativeModel(model_name="gemini-1.5-flash")
+MODEL_NAME = "gemini-1.5-flash"
+
+# Empty rows needed between two lines of working for them to be solved separately
+REGION_GAP = int(os.getenv("CANVAS_REGION_GAP", "30"))
+
+
+@lru_cache(maxsize=None)
+def get_model():
+    """Configure the Gemini SDK on first use, so importing this module doesn't load it"""
+    import google.generativeai as ai
+    
+    ai.configure(api_key=GEMINI_API_KEY)
+    return ai.GenerativeModel(model_name=MODEL_NAME)
 
 
 class ImageInfo(BaseModel):
     image: str
-    dict_of_vars: dict
+    dict_of_vars: dict = {}
     action: str
+    # With a session id, assigned variables are kept server-side between solves
+    session_id: Optional[str] = None
+
+
+class VariableStore:
+    """SQLite table of canvas variables per session, shared by every worker"""
+
+    def __init__(self, db_path="canvas.db"):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS variables (
+                    session_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (session_id, name)
+                );
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        rows = self._connect().execute(
+            "SELECT name, value FROM variables WHERE session_id = ? ORDER BY name", (session_id,)
+        ).fetchall()
+        return {row["name"]: json.loads(row["value"]) for row in rows}
+
+    def update(self, session_id, variables):
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO variables (session_id, name, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_id, name) DO UPDATE SET value = excluded.value, "
+                "updated_at = excluded.updated_at",
+                [(session_id, name, json.dumps(value), now) for name, value in variables.items()]
+            )
+
+    def clear(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM variables WHERE session_id = ?", (session_id,))
+
+
+@lru_cache(maxsize=None)
+def get_variable_store():
+    return VariableStore(os.getenv("CANVAS_DB", "canvas.db"))
+
+
+_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.Pow: operator.pow, ast.USub: operator.neg, ast.UAdd: operator.pos,
+}
+
+_FUNCTIONS = {
+    name: getattr(math, name)
+    for name in ("sqrt", "sin", "cos", "tan", "log", "log10", "exp", "factorial", "floor", "ceil")
+}
+_FUNCTIONS.update(abs=abs, round=round)
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+
+def evaluate_expression(expression, variables):
+    """Evaluate plain arithmetic over known variables; raises ValueError for anything else"""
+    text = str(expression).replace("×", "*").replace("÷", "/").replace("^", "**").replace("−", "-")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError(f"not an arithmetic expression: {expression}")
+
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in variables:
+                return _number(variables[node.id])
+            if node.id in _CONSTANTS:
+                return _CONSTANTS[node.id]
+            raise ValueError(f"unknown variable {node.id}")
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+            return _OPERATORS[type(node.op)](visit(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            left, right = visit(node.left), visit(node.right)
+            # Keep pathological powers from tying up the worker
+            if isinstance(node.op, ast.Pow) and (
+                    abs(right) > 1000 or (isinstance(left, int) and left.bit_length() * abs(right) > 4096)):
+                raise ValueError("result too large")
+            return _OPERATORS[type(node.op)](left, right)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in _FUNCTIONS and not node.keywords:
+            args = [visit(arg) for arg in node.args]
+            if node.func.id == "factorial" and args and abs(args[0]) > 170:
+                raise ValueError("result too large")
+            return _FUNCTIONS[node.func.id](*args)
+        raise ValueError(f"unsupported expression: {expression}")
+
+    try:
+        return visit(tree)
+    except (ArithmeticError, TypeError) as e:
+        raise ValueError(str(e))
 
 
-def process_image(img: Image, dict_of_vars: dict, action: str):
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value) if "." in str(value) else int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"not a number: {value}")
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(round(value, 10)) if isinstance(value, float) else str(value)
+
+
+def resolve_locally(answers, variables):
+    """Check answers against known variables and collect new assignments.
+
+    Expressions the local evaluator understands get an exact result instead
+    of the model's, and `x = <expr>` assignments are evaluated in order so
+    later lines can use earlier ones. Returns the newly assigned variables.
+    """
+    known = dict(variables)
+    assigned = {}
+    for answer in answers:
+        expression = answer.get("expr")
+        if not expression:
+            continue
+        if answer.get("assign"):
+            try:
+                value = evaluate_expression(answer.get("solution"), known)
+            except ValueError:
+                value = answer.get("solution")
+            known[expression] = assigned[expression] = value
+            answer["solution"] = _format_number(value) if isinstance(value, (int, float)) else value
+            continue
+        try:
+            answer["solution"] = _format_number(evaluate_expression(expression, known))
+        except ValueError:
+            pass
+    return assigned
+
+
+def build_prompt(dict_of_vars: dict, action: str):
     dict_of_vars_to_str = json.dumps(dict_of_vars, ensure_ascii=False)
     
     if action == "Mathematics":
@@ -60,8 +243,6 @@ def process_image(img: Image, dict_of_vars: dict, action: str):
             "6.Final result: 21.\n\n"
 
             f"Use the following dictionary of user-assigned variables if any appear in the expression: {dict_of_vars_to_str}.\n"
-            "Escape characters like \\f and \\n should be written as \\\\f and \\\\n.\n"
-            "DO NOT USE backticks or Markdown formatting. Ensure all dictionary keys and values are properly quoted for easy parsing with Python's ast.literal_eval.\n"
         )
 
     elif action == "Aptitude":
@@ -102,22 +283,6 @@ def process_image(img: Image, dict_of_vars: dict, action: str):
             "   - Double-check calculation"
             "   - Verify answer matches given options (if provided)"
 
-            "OUTPUT FORMAT:"
-            "Return a DICT with the following structure:"
-            "{"
-            "    'pattern_type': 'type of pattern identified',"
-            "    'pattern_rules': ['rule1', 'rule2', ...],"
-            "    'solution_steps': ["
-            "        'step1: examination of values',"
-            "        'step2: pattern identification',"
-            "        'step3: verification',"
-            "        'step4: final calculation'"
-            "    ],"
-            "    'missing_value': 'calculated answer',"
-            "    'verification': 'how answer fits pattern',"
-            "    'alternatives_considered': ['other patterns checked']"
-            "}"
-
             "Examples:"  
             "eXAMPLE #1: \"3 4 5\""
             "	     \"6 8 10\""
@@ -173,39 +338,41 @@ def process_image(img: Image, dict_of_vars: dict, action: str):
     else:
         prompt = "Solve the problem in the image systematically."
 
+    return prompt + "\n\n" + format_instructions(response_schema(action))
+
+
+def process_image(img: "Image.Image", dict_of_vars: dict, action: str):
+    prompt = build_prompt(dict_of_vars, action)
+    schema = response_schema(action)
+
     try:
-        response = model.generate_content([prompt, img])
-        print("Raw response:", response.text)
-        
-        
-        text = response.text.strip()
-        
-        
-        steps = []
-        final_result = None
-        
-        
-        step_matches = re.finditer(r'(\d+)\.\s*([^\n]+)', text)
-        for match in step_matches:
-            steps.append(match.group(2).strip())
-        
-        
-        final_match = re.search(r'Final Result:?\s*(\d+(?:\.\d+)?)', text)
-        if final_match:
-            final_result = final_match.group(1)
+        text = _generate([prompt, img])
+        logger.debug("Raw canvas response: %s", text)
         
+        try:
+            parsed = parse_response(text, schema)
+        except ResponseFormatError as error:
+            # One text-only repair call is cheaper than the student resubmitting the canvas
+            logger.warning("Malformed canvas response (%s), asking for a repair", error)
+            parsed = None
+            try:
+                parsed = parse_response(_generate([build_repair_prompt(schema, text, error)]), schema)
+            except (ResponseFormatError, SchedulerTimeout) as repair_error:
+                logger.warning("Canvas response repair failed: %s", repair_error)
         
-        answer = {
-            'solution': final_result,
-            'steps': steps,
-            'explanation': text,
-            'assign': False
-        }
-        print(answer)
-        return [answer]  
-
+        if parsed is None:
+            return [{
+                'solution': None,
+                'steps': [],
+                'explanation': text,
+                'assign': False
+            }]
+        return to_answers(parsed)
+
+    except SchedulerTimeout:
+        raise
     except Exception as error:
-        print(f"Error processing image: {error}")
+        logger.exception("Error processing image")
         return [{
             'error': str(error),
             'solution': 'Error in processing',
@@ -214,18 +381,118 @@ def process_image(img: Image, dict_of_vars: dict, action: str):
         }]
 
 
+def _variables_digest(dict_of_vars):
+    """Short stable hash of the variables a solve was given"""
+    encoded = json.dumps(dict_of_vars or {}, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _region_cache_key(action, region, variables_digest):
+    # A line like `y = x + 1` solves differently once `x` changes, so the variables are part of the key
+    return [{"role": "user", "content": f"canvas-region:{action}:{variables_digest}:{region['hash']}"}]
+
+
+def _solved(answers):
+    return all('error' not in answer and answer.get('solution') is not None for answer in answers)
+
+
+def solve_canvas(img: "Image.Image", dict_of_vars: dict, action: str):
+    """Solve a canvas, sending the model only the lines it hasn't seen yet.
+
+    Mathematics canvases are split into lines of working. Lines whose ink is
+    unchanged since an earlier submit with the same variables are answered
+    from the prompt cache; the rest are stacked into one image and solved in
+    a single call. Other
+    actions are one puzzle per canvas and are always solved whole.
+    Returns (answers, stats).
+    """
+    img = flatten(img)
+    regions = segment_regions(img, min_gap=REGION_GAP) if action == "Mathematics" else []
+    if not regions:
+        return process_image(img, dict_of_vars, action), {"regions": 0, "cached": 0}
+
+    cache = get_cache()
+    model = f"gemini/{MODEL_NAME}"
+    variables_digest = _variables_digest(dict_of_vars)
+    cached, missing = {}, []
+    for index, region in enumerate(regions):
+        answers = cache.get(model, _region_cache_key(action, region, variables_digest))
+        record_cache_lookup(answers is not None)
+        if answers is not None:
+            # resolve_locally edits answers in place, so never hand out the cached objects
+            cached[index] = copy.deepcopy(answers)
+        else:
+            missing.append(index)
+
+    fresh = {}
+    if missing:
+        sheet = stack_regions(img, [regions[i] for i in missing])
+        answers = process_image(sheet, dict_of_vars, action)
+        if len(answers) == len(missing) and _solved(answers):
+            # One solution per line, top to bottom, so each line gets its own answer
+            for index, answer in zip(missing, answers):
+                fresh[index] = [answer]
+                cache.put(model, _region_cache_key(action, regions[index], variables_digest),
+                          copy.deepcopy([answer]))
+        else:
+            # Can't tell which answer belongs to which line, so return them together
+            # at the first new line's position and don't cache them
+            fresh[missing[0]] = answers
+
+    ordered = []
+    for index in range(len(regions)):
+        ordered.extend(cached.get(index) or fresh.get(index) or [])
+    return ordered, {"regions": len(regions), "cached": len(cached)}
+
+
+def _generate(contents):
+    """One Gemini call in JSON mode, admitted by the shared scheduler"""
+    # Canvas solves are interactive, so they are served ahead of batch generations
+    get_scheduler().acquire(f"gemini/{MODEL_NAME}", priority=INTERACTIVE)
+    
+    started = time.perf_counter()
+    response = get_model().generate_content(
+        contents,
+        generation_config={"response_mime_type": "application/json"}
+    )
+    usage = getattr(response, "usage_metadata", None)
+    record_llm_call(
+        f"gemini/{MODEL_NAME}",
+        time.perf_counter() - started,
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "candidates_token_count", None)
+    )
+    return response.text.strip()
+
+
 router = APIRouter()
 
+# Estimated model calls per request (one solve; a repair call is rare) and priority
+ADMISSION_COSTS = {("POST", "/calculate"): (1, INTERACTIVE)}
+
 @router.post('')
 async def run(data: ImageInfo):
+    from PIL import Image
     
     image_data = base64.b64decode(data.image.split(",")[1])
     image_bytes = BytesIO(image_data)
     
+    # Variables sent with the request win over the stored ones for this solve
+    variables = dict(data.dict_of_vars)
+    if data.session_id:
+        stored = await asyncio.to_thread(get_variable_store().get, data.session_id)
+        variables = {**stored, **variables}
     
     image = Image.open(image_bytes)
-    responses = process_image(image, dict_of_vars=data.dict_of_vars, action=data.action)
+    try:
+        # Segmentation and model calls block, so keep them off the event loop
+        responses, region_stats = await asyncio.to_thread(solve_canvas, image, variables, data.action)
+    except SchedulerTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     
+    assigned = resolve_locally(responses, variables)
+    if data.session_id and assigned:
+        await asyncio.to_thread(get_variable_store().update, data.session_id, assigned)
     
     data_list = []
     for response in responses:
@@ -234,33 +501,59 @@ async def run(data: ImageInfo):
     return {
         "message": "Image processed",
         "data": data_list,
+        "variables": {**variables, **assigned},
+        "regions": region_stats,
         "status": "success"
     }
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    yield
+@router.get('/variables/{session_id}')
+async def get_variables(session_id: str):
+    variables = await asyncio.to_thread(get_variable_store().get, session_id)
+    return {"session_id": session_id, "variables": variables}
 
-app = FastAPI(lifespan=lifespan)
 
+@router.delete('/variables/{session_id}')
+async def clear_variables(session_id: str):
+    await asyncio.to_thread(get_variable_store().clear, session_id)
+    return {"session_id": session_id, "variables": {}}
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"]
-)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
 
-@app.get("/")
 async def health():
     return {"message": "server is running fine andi...!"}
 
 
-app.include_router(router, prefix="/calculate", tags=["calculate"])
+def create_app():
+    """Build the canvas app; the Gemini SDK and Pillow load on the first solve"""
+    app = FastAPI(lifespan=lifespan)
+    
+    
+    # Added before CORS so shed requests still carry CORS headers
+    admit_requests(app, ADMISSION_COSTS)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[TRACE_HEADER, "Retry-After"]
+    )
+    
+    instrument_app(app, "canvas")
+    
+    app.add_api_route("/", health, methods=["GET"])
+    app.include_router(router, prefix="/calculate", tags=["calculate"])
+    return app
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("canvas:app", host=SERVER_URL, port=int(PORT), reload=(ENV == "dev"))
\ No newline at end of file
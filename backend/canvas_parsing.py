@@ -0,0 +1,183 @@
+import ast
+import json
+from typing import List, Union
+
+from pydantic import BaseModel
+
+from markdown_fences import tokenize_fences
+
+
+Scalar = Union[str, int, float]
+
+
+class MathSolution(BaseModel):
+    expression: str
+    steps: List[str] = []
+    result: Scalar
+    assign: bool = False
+
+
+class MathematicsResponse(BaseModel):
+    solutions: List[MathSolution]
+
+
+class AptitudeResponse(BaseModel):
+    pattern_type: str
+    pattern_rules: List[str] = []
+    solution_steps: List[str] = []
+    missing_value: Scalar
+    verification: str = ""
+    alternatives_considered: List[str] = []
+
+
+class GeneralResponse(BaseModel):
+    steps: List[str] = []
+    result: Scalar
+    explanation: str = ""
+
+
+RESPONSE_SCHEMAS = {
+    "Mathematics": MathematicsResponse,
+    "Aptitude": AptitudeResponse,
+}
+
+# The JSON shape each action's prompt asks for, with one filled-in example
+RESPONSE_FORMATS = {
+    MathematicsResponse: (
+        '{"solutions": [{"expression": "2 + 3 * 4", '
+        '"steps": ["Multiply 3 by 4 to get 12.", "Add 2 to 12 to get 14."], '
+        '"result": "14", "assign": false}]}\n'
+        "Add one entry to \"solutions\" per expression in the image, from top to bottom. For an assignment such as "
+        "x = 5, set \"expression\" to the variable name, \"result\" to its value and \"assign\" to true."
+    ),
+    AptitudeResponse: (
+        '{"pattern_type": "number series", '
+        '"pattern_rules": ["differences grow by 3"], '
+        '"solution_steps": ["step1: examination of values", "step2: pattern identification", '
+        '"step3: verification", "step4: final calculation"], '
+        '"missing_value": "72", '
+        '"verification": "how the answer fits the pattern", '
+        '"alternatives_considered": ["other patterns checked"]}'
+    ),
+    GeneralResponse: (
+        '{"steps": ["first step", "second step"], "result": "final answer", '
+        '"explanation": "short explanation"}'
+    ),
+}
+
+
+class ResponseFormatError(ValueError):
+    """The model's reply could not be parsed into the expected schema"""
+
+
+def response_schema(action):
+    return RESPONSE_SCHEMAS.get(action, GeneralResponse)
+
+
+def format_instructions(schema):
+    return (
+        "OUTPUT FORMAT:\n"
+        "Respond with a single JSON object and nothing else, no Markdown and no backticks, "
+        "shaped like this example:\n"
+        f"{RESPONSE_FORMATS[schema]}\n"
+    )
+
+
+def _candidates(text):
+    """JSON-looking snippets of a reply: fenced blocks first, then the first top-level value"""
+    for block in tokenize_fences(text):
+        if block["language"] in (None, "json", "python"):
+            yield block["code"]
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start != -1:
+        yield text[start:]
+
+
+def _load(snippet):
+    """Decode the first JSON value in a snippet, ignoring anything after it"""
+    snippet = snippet.strip()
+    try:
+        return json.JSONDecoder().raw_decode(snippet)[0]
+    except ValueError:
+        pass
+    # Replies in Python-dict style (single quotes, True/False) are still literals
+    end = max(snippet.rfind("}"), snippet.rfind("]")) + 1
+    try:
+        return ast.literal_eval(snippet[:end])
+    except (ValueError, SyntaxError):
+        raise ResponseFormatError("reply does not contain a JSON object")
+
+
+def parse_response(text, schema):
+    """Parse and validate a model reply against `schema`; raises ResponseFormatError"""
+    error = ResponseFormatError("reply does not contain a JSON object")
+    for snippet in _candidates(text or ""):
+        try:
+            data = _load(snippet)
+        except ResponseFormatError as e:
+            error = e
+            continue
+        # A bare list of solutions is unambiguous, so accept it without a repair call
+        if schema is MathematicsResponse and isinstance(data, list):
+            data = {"solutions": data}
+        if not isinstance(data, dict):
+            error = ResponseFormatError(f"expected a JSON object, got {type(data).__name__}")
+            continue
+        try:
+            return schema(**data)
+        except (TypeError, ValueError) as e:
+            # pydantic's ValidationError is a ValueError in both major versions
+            error = ResponseFormatError(str(e))
+    raise error
+
+
+def build_repair_prompt(schema, text, error):
+    """Text-only prompt asking the model to reformat its own reply, without re-solving"""
+    return (
+        "The reply below was supposed to be a single JSON object but could not be parsed.\n"
+        f"Problem: {error}\n\n"
+        f"Reply:\n{text}\n\n"
+        "Rewrite it as valid JSON with exactly this shape, keeping the same answers and steps:\n"
+        f"{RESPONSE_FORMATS[schema]}\n"
+        "Respond with the JSON object only."
+    )
+
+
+def _text(value):
+    return str(value) if value is not None else None
+
+
+def _explain(lines, result, label="Final result"):
+    """Readable explanation ending with the result, which is what the canvas shows"""
+    return "\n".join([line for line in lines if line] + [f"{label}: {result}"])
+
+
+def to_answers(parsed):
+    """Turn a validated reply into the answer dicts the canvas frontend renders"""
+    if isinstance(parsed, MathematicsResponse):
+        return [
+            {
+                "expr": solution.expression,
+                "solution": _text(solution.result),
+                "steps": solution.steps,
+                "explanation": _explain(solution.steps, solution.result),
+                "assign": solution.assign
+            }
+            for solution in parsed.solutions
+        ]
+    if isinstance(parsed, AptitudeResponse):
+        return [{
+            "solution": _text(parsed.missing_value),
+            "steps": parsed.solution_steps,
+            "explanation": _explain([parsed.verification], parsed.missing_value, "Final answer"),
+            "pattern_type": parsed.pattern_type,
+            "pattern_rules": parsed.pattern_rules,
+            "alternatives_considered": parsed.alternatives_considered,
+            "assign": False
+        }]
+    return [{
+        "solution": _text(parsed.result),
+        "steps": parsed.steps,
+        "explanation": _explain([parsed.explanation], parsed.result),
+        "assign": False
+    }]
@@ -0,0 +1,291 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class ChatStore:
+    """SQLite store for chat sessions, messages and facts, keyed by API key.
+
+    The database runs in WAL mode so several uvicorn workers can read while
+    one writes, and every write is a single short transaction. Messages carry
+    a per-session position (`seq`), so history windows are index range reads
+    instead of loading the whole conversation.
+    """
+
+    def __init__(self, db_path="chat_memory.db"):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        # WAL is a property of the database file, so setting it once is enough
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    api_key TEXT PRIMARY KEY,
+                    language TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summary_covered INTEGER NOT NULL DEFAULT 0,
+                    summary_timestamp TEXT
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    api_key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_session_seq
+                    ON messages (api_key, seq);
+                CREATE INDEX IF NOT EXISTS idx_messages_session_time
+                    ON messages (api_key, timestamp);
+                CREATE TABLE IF NOT EXISTS facts (
+                    api_key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    slot TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    PRIMARY KEY (api_key, slot, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_facts_session
+                    ON facts (api_key, position);
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # Safe with WAL: a crash can lose the last commit but never corrupts the file
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ensure_session(self, api_key, language):
+        """Create the session, or just update its language if it already exists"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (api_key, language, timestamp) VALUES (?, ?, ?) "
+                "ON CONFLICT(api_key) DO UPDATE SET language = excluded.language",
+                (api_key, language, datetime.now().isoformat())
+            )
+
+    def get_session(self, api_key):
+        row = self._connect().execute(
+            "SELECT * FROM sessions WHERE api_key = ?", (api_key,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def add_messages(self, api_key, messages):
+        """Append (role, content) pairs in one transaction; returns their first position"""
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        with conn:
+            # Take the write lock before reading the next position so that
+            # workers appending to the same session can't pick the same seq
+            conn.execute("BEGIN IMMEDIATE")
+            start = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE api_key = ?", (api_key,)
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO messages (api_key, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(api_key, start + i, role, content, now) for i, (role, content) in enumerate(messages)]
+            )
+        return start
+
+    def seed_messages(self, api_key, messages):
+        """Add opening messages only if the session has none yet; returns whether they were added"""
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        with conn:
+            # Checked under the write lock, so workers starting the same session seed it once
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM messages WHERE api_key = ? LIMIT 1", (api_key,)).fetchone():
+                return False
+            conn.executemany(
+                "INSERT INTO messages (api_key, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(api_key, i, role, content, now) for i, (role, content) in enumerate(messages)]
+            )
+        return True
+
+    def count_messages(self, api_key):
+        return self._connect().execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE api_key = ?", (api_key,)
+        ).fetchone()[0]
+
+    def get_messages(self, api_key, start=0, end=None):
+        """Messages with positions in [start, end), oldest first"""
+        query = "SELECT seq, role, content, timestamp FROM messages WHERE api_key = ? AND seq >= ?"
+        params = [api_key, start]
+        if end is not None:
+            query += " AND seq < ?"
+            params.append(end)
+        rows = self._connect().execute(query + " ORDER BY seq", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_recent_messages(self, api_key, limit):
+        """The last `limit` messages, oldest first"""
+        rows = self._connect().execute(
+            "SELECT seq, role, content, timestamp FROM messages WHERE api_key = ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (api_key, limit)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def get_page(self, api_key, limit=50, before=None, after=None, since=None):
+        """One window of history, oldest first, plus whether more lies beyond it.
+
+        Pages walk backwards from the newest message (or from `before`), or
+        forwards from `after` or `since`. `since` is an ISO timestamp; it is
+        turned into a starting position through the timestamp index, so every
+        page is a range read on (api_key, seq).
+        """
+        clauses, params = ["api_key = ?"], [api_key]
+        if since is not None:
+            first = self._connect().execute(
+                "SELECT MIN(seq) FROM messages WHERE api_key = ? AND timestamp >= ?", (api_key, since)
+            ).fetchone()[0]
+            if first is None:
+                return [], False
+            clauses.append("seq >= ?")
+            params.append(first)
+        if before is not None:
+            clauses.append("seq < ?")
+            params.append(before)
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(after)
+        forward = after is not None or (since is not None and before is None)
+        order = "ASC" if forward else "DESC"
+        rows = self._connect().execute(
+            f"SELECT seq, role, content, timestamp FROM messages WHERE {' AND '.join(clauses)} "
+            f"ORDER BY seq {order} LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        has_more = len(rows) > limit
+        messages = [dict(row) for row in rows[:limit]]
+        if not forward:
+            messages.reverse()
+        return messages, has_more
+
+    def count_facts(self, api_key):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM facts WHERE api_key = ?", (api_key,)
+        ).fetchone()[0]
+
+    def get_recent_facts(self, api_key, limit):
+        rows = self._connect().execute(
+            "SELECT slot, key, value, content, timestamp FROM facts WHERE api_key = ? "
+            "ORDER BY position DESC LIMIT ?",
+            (api_key, limit)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def get_facts(self, api_key, slot=None):
+        query = "SELECT slot, key, value, content, timestamp FROM facts WHERE api_key = ?"
+        params = [api_key]
+        if slot is not None:
+            query += " AND slot = ?"
+            params.append(slot)
+        rows = self._connect().execute(query + " ORDER BY position", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def update_facts(self, api_key, update):
+        """Apply `update(records) -> new records or None` to the session's facts atomically.
+
+        The facts are re-read under the write lock, so concurrent workers
+        merge into each other's changes instead of overwriting them.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT slot, key, value, content, timestamp FROM facts WHERE api_key = ? ORDER BY position",
+                (api_key,)
+            ).fetchall()
+            records = update([dict(row) for row in rows])
+            if records is None:
+                return False
+            conn.execute("DELETE FROM facts WHERE api_key = ?", (api_key,))
+            conn.executemany(
+                "INSERT INTO facts (api_key, position, slot, key, value, content, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(api_key, i, fact["slot"], fact["key"], fact["value"], fact["content"], fact["timestamp"])
+                 for i, fact in enumerate(records)]
+            )
+        return True
+
+    def set_summary(self, api_key, content, covered):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE sessions SET summary = ?, summary_covered = ?, summary_timestamp = ? "
+                "WHERE api_key = ?",
+                (content, covered, datetime.now().isoformat(), api_key)
+            )
+
+    def import_json(self, path):
+        """One-off import of the old chat_memory.json file; returns the number of sessions added"""
+        from fact_store import FactStore
+
+        with open(path) as f:
+            all_memories = json.load(f)
+        imported = 0
+        conn = self._connect()
+        with conn:
+            for api_key, memories in all_memories.items():
+                exists = conn.execute(
+                    "SELECT 1 FROM sessions WHERE api_key = ?", (api_key,)
+                ).fetchone()
+                if exists:
+                    continue
+                session = memories.get("session", {})
+                summary = session.get("summary", {})
+                conn.execute(
+                    "INSERT INTO sessions (api_key, language, timestamp, summary, summary_covered, "
+                    "summary_timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                    (api_key, session.get("language", "English"),
+                     session.get("timestamp", datetime.now().isoformat()),
+                     summary.get("content", ""), summary.get("covered", 0), summary.get("timestamp"))
+                )
+                conn.executemany(
+                    "INSERT INTO messages (api_key, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [(api_key, i, msg["role"], msg["content"], msg.get("timestamp", ""))
+                     for i, msg in enumerate(session.get("messages", []))]
+                )
+                facts = FactStore.from_records(memories.get("facts", [])).records()
+                conn.executemany(
+                    "INSERT INTO facts (api_key, position, slot, key, value, content, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(api_key, i, fact["slot"], fact["key"], fact["value"], fact["content"], fact["timestamp"])
+                     for i, fact in enumerate(facts)]
+                )
+                imported += 1
+        return imported
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store():
+    """Process-wide chat store; CHAT_MEMORY_DB picks the database file"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ChatStore(os.getenv("CHAT_MEMORY_DB", "chat_memory.db"))
+                legacy = os.getenv("CHAT_MEMORY_JSON", "chat_memory.json")
+                if os.path.exists(legacy):
+                    try:
+                        imported = store.import_json(legacy)
+                        if imported:
+                            print(f"Imported {imported} chat session(s) from {legacy}")
+                    except Exception as e:
+                        print(f"Error importing {legacy}: {str(e)}")
+                _store = store
+    return _store
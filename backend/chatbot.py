@@ -1,45 +1,43 @@
 import os
 import json
+import asyncio
+import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Dict, Any, List
 
 
-from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 
-import google.generativeai as genai
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import SerperDevTool
-from dotenv import load_dotenv()
+from dotenv import load_dotenv
+
+from chat_store import get_chat_store
+from context_budget import ContextBudgeter
+from fact_store import FactStore, heuristic_facts
+from llm_client import GeminiLLM
+from llm_scheduler import INTERACTIVE, SchedulerTimeout, request_context, surface_timeouts
+from instrumentation import TRACE_HEADER, instrument_app
+from admission import admit_requests
+from session_locks import SessionBusy, SessionLocks
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 
 
-genai.configure(api_key=GEMINI_API_KEY)
-os.environ["GEMINI_API_KEY"] = GEMINI_API_KEY
-os.environ["SERPER_API_KEY"] = SERPER_API_KEY
-
-
-serper_tool = SerperDevTool()
-
-
-app = FastAPI(title="Multilingual Agent Chatbot API")
-
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@lru_cache(maxsize=None)
+def get_serper_tool():
+    """Create the web search tool on first use, so importing this module doesn't load crewai_tools"""
+    from crewai_tools import SerperDevTool
+    return SerperDevTool()
 
 
 class ChatRequest(BaseModel):
@@ -55,118 +53,125 @@ class ChatResponse(BaseModel):
 class DebugRequest(BaseModel):
     api_key: str
 
+class HistoryMessage(BaseModel):
+    seq: int
+    role: str
+    content: str
+    timestamp: str
+
+class HistoryResponse(BaseModel):
+    api_key: str
+    messages: List[HistoryMessage]
+    total: int
+    has_more: bool
+    # Pass as `before` for the previous (older) page, or as `after` to poll for newer messages
+    older_cursor: Optional[int] = None
+    newer_cursor: Optional[int] = None
+
 
 
 class ChatMemory:
     """A class to handle persistent chat memory across sessions using API key"""
     
-    def __init__(self, api_key="default_api_key", memory_file="chat_memory.json"):
+    def __init__(self, api_key="default_api_key", store=None, budgeter=None):
         self.api_key = api_key
-        self.memory_file = memory_file
-        self.memories = self._load_memories()
-        
-    def _load_memories(self):
-        """Load existing memories from file"""
-        try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r') as f:
-                    all_memories = json.load(f)
-                
-                # Return this API key's memories or create new entry
-                return all_memories.get(self.api_key, {"session": {"messages": []}, "facts": []})
-            else:
-                return {"session": {"messages": []}, "facts": []}
-        except Exception as e:
-            print(f"Error loading memories: {str(e)}")
-            return {"session": {"messages": []}, "facts": []}
-    
-    def _save_memories(self):
-        """Save memories to file"""
-        try:
-            # Load all API keys' data first
-            all_memories = {}
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r') as f:
-                    all_memories = json.load(f)
-            
-            # Update this API key's data
-            all_memories[self.api_key] = self.memories
-            
-            # Save back to file
-            with open(self.memory_file, 'w') as f:
-                json.dump(all_memories, f, indent=2)
-        except Exception as e:
-            print(f"Error saving memories: {str(e)}")
+        # Shared SQLite store, so every worker process sees the same memory
+        self.store = store or get_chat_store()
+        self.budgeter = budgeter or ContextBudgeter()
     
     def initialize_session(self, language):
         """Initialize or continue the existing session"""
-        if "session" not in self.memories:
-            self.memories["session"] = {
-                "timestamp": datetime.now().isoformat(),
-                "language": language,
-                "messages": []
-            }
-        else:
-            # Just update the language in case it changed
-            self.memories["session"]["language"] = language
-            
-        self._save_memories()
+        self.store.ensure_session(self.api_key, language)
     
     def add_message(self, role, content):
         """Add a message to the session"""
-        self.memories["session"]["messages"].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        self._save_memories()
+        self.store.add_messages(self.api_key, [(role, content)])
+    
+    def add_messages(self, messages):
+        """Add several (role, content) messages in one write"""
+        self.store.add_messages(self.api_key, messages)
+    
+    def seed_messages(self, messages):
+        """Add opening messages to a session that has none yet"""
+        return self.store.seed_messages(self.api_key, messages)
     
     def add_fact(self, fact):
-        """Add a fact about the user for long-term memory"""
-        self.memories["facts"].append({
-            "content": fact,
-            "timestamp": datetime.now().isoformat()
-        })
-        self._save_memories()
+        """Add a fact about the user for long-term memory, superseding stale ones"""
+        def merge(records):
+            fact_store = FactStore.from_records(records)
+            return fact_store.records() if fact_store.add(fact) else None
+        return self.store.update_facts(self.api_key, merge)
     
     def get_session_history(self, limit=None):
         """Get the complete message history for the session with optional limit"""
         if limit is None:
-            return self.memories["session"]["messages"]
-        return self.memories["session"]["messages"][-limit:]
+            return self.store.get_messages(self.api_key)
+        return self.store.get_recent_messages(self.api_key, limit)
+    
+    def get_messages(self, start=0, end=None):
+        """Get the messages at positions [start, end) without loading the rest"""
+        return self.store.get_messages(self.api_key, start, end)
+    
+    def message_count(self):
+        return self.store.count_messages(self.api_key)
     
-    def get_facts(self):
-        """Get all facts about the user"""
-        return self.memories["facts"]
+    def get_history_page(self, limit=50, before=None, after=None, since=None):
+        """Get one window of history and whether more messages lie beyond it"""
+        return self.store.get_page(self.api_key, limit, before, after, since)
+    
+    def get_facts(self, slot=None):
+        """Get all facts about the user, or only those in one slot"""
+        return self.store.get_facts(self.api_key, slot)
+
+    def get_summary(self):
+        """Get the rolling summary of older turns and how many messages it covers"""
+        session = self.store.get_session(self.api_key)
+        if session is None:
+            return {"content": "", "covered": 0}
+        return {"content": session["summary"], "covered": session["summary_covered"]}
+    
+    def set_summary(self, content, covered):
+        """Replace the rolling summary with one covering the first `covered` messages"""
+        self.store.set_summary(self.api_key, content, covered)
 
-    def get_formatted_memory_context(self, history_limit=None):
-        """Format memory as context for the model with optional history limit"""
-        context = "User's previous information:\n"
-        
-        # Add facts about the user
-        if self.memories["facts"]:
-            context += "Facts about the user:\n"
-            for fact in self.memories["facts"]:
-                context += f"- {fact['content']}\n"
-            context += "\n"
-        
-        # Add conversation history with optional limit
-        messages = self.get_session_history(history_limit)
-        if len(messages) > 0:
-            context += "Conversation history:\n"
-            for msg in messages:
-                context += f"{msg['role'].title()}: {msg['content']}\n"
+    def get_formatted_memory_context(self, history_limit=None, query=""):
+        """Format memory as context for the model, packed into the token budget"""
+        messages = self.budgeter.unsummarized(self)
+        if history_limit is not None:
+            messages = messages[-history_limit:]
         
+        context = "User's previous information:\n"
+        context += self.budgeter.pack(
+            query,
+            facts=self.get_facts(),
+            messages=messages,
+            summary=self.get_summary()["content"]
+        )
         return context
     
+    def get_debug_info(self):
+        """Debug information about the session, read from the shared store"""
+        session = self.store.get_session(self.api_key)
+        return {
+            "api_key": self.api_key,
+            "language": session["language"] if session else None,
+            "facts_count": self.store.count_facts(self.api_key),
+            "conversation_turns": self.message_count() // 2,
+            "recent_facts": [fact["content"] for fact in self.store.get_recent_facts(self.api_key, 3)],
+            "recent_messages": [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in self.get_recent_messages(3)
+            ]
+        }
+    
     def get_recent_messages(self, count=5):
         """Get only the most recent messages"""
-        messages = self.get_session_history()
-        return messages[-count:] if len(messages) >= count else messages
+        return self.store.get_recent_messages(self.api_key, count)
     
-    def search_memory(self, query, limit=10):
+    def search_memory(self, query, limit=10, max_candidates=50):
         """Semantic search of past messages based on relevance to the query"""
-        messages = self.get_session_history()
+        # Only rank the most recent candidates so the ranking prompt stays bounded
+        messages = self.get_session_history(max_candidates)
         
         if not messages:
             return []
@@ -224,10 +229,10 @@ class ChatMemory:
         # Fallback to keyword search if semantic search fails
         return self._keyword_search(query, limit)
 
-    def _keyword_search(self, query, limit=10):
+    def _keyword_search(self, query, limit=10, max_candidates=50):
         """Simple keyword-based search (fallback method)"""
         results = []
-        messages = self.get_session_history()
+        messages = self.get_session_history(max_candidates)
         
         query_terms = query.lower().split()
         
@@ -242,23 +247,6 @@ class ChatMemory:
         return results
 
 
-class GeminiLLM:
-    """Wrapper for the Gemini model integration with CrewAI"""
-    
-    def __init__(self, model_name="gemini/gemini-2.0-flash-lite"):
-        self.model_name = model_name
-        self.gemini_model = genai.GenerativeModel("gemini-2.0-flash-lite")
-    
-    def generate(self, messages):
-        # Format messages for Gemini
-        formatted_prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
-        response = self.gemini_model.generate_content(formatted_prompt)
-        return response.text
-        
-    def chat(self, messages):
-        return self.generate(messages)
-
-
 class MemoryRetrievalAgent:
     """Agent that determines whether and how to use memory based on the context"""
     
@@ -290,7 +278,8 @@ class MemoryRetrievalAgent:
             {"role": "user", "content": f"User query: {query}\nAnalyze this query and determine memory requirements:"}
         ]
         
-        response = self.llm.generate(messages)
+        # The decision depends only on the query text, so identical queries share it
+        response = self.llm.generate(messages, cache=True)
         
         try:
            
@@ -326,25 +315,19 @@ class MemoryRetrievalAgent:
         decision = self.analyze_query(query)
         
         
-        print(f"Memory retrieval decision: {decision['explanation']}")
-        
-        
-        context = ""
+        logger.debug("Memory retrieval decision: %s", decision["explanation"])
         
         
-        if decision["needs_facts"]:
-            facts = self.memory.get_facts()
-            if facts:
-                context += "Facts about the user:\n"
-                for fact in facts:
-                    context += f"- {fact['content']}\n"
-                context += "\n"
-        
+        facts = self.memory.get_facts() if decision["needs_facts"] else []
+        messages = []
+        search_results = []
+        summary = ""
         
         if decision["needs_history"]:
-            
+            # "all" means everything not yet folded into the rolling summary
+            summary = self.memory.get_summary()["content"]
             if decision["history_turns"] == "all":
-                messages = self.memory.get_session_history()
+                messages = self.memory.budgeter.unsummarized(self.memory)
             else:
                 try:
                     turns = int(decision["history_turns"])
@@ -353,29 +336,19 @@ class MemoryRetrievalAgent:
                     
                     messages = self.memory.get_recent_messages(6)
             
-            #
-            if messages:
-                context += "Relevant conversation history:\n"
-                for msg in messages:
-                    context += f"{msg['role'].title()}: {msg['content']}\n"
-            
             
             if decision.get("search_terms") and len(decision["search_terms"]) > 0:
                 
                 search_query = " ".join(decision["search_terms"])
                 search_results = self.memory.search_memory(search_query)
-                
-                if search_results and len(search_results) > 0:
-                    
-                    unique_results = []
-                    for msg in search_results:
-                        if msg not in messages:  
-                            unique_results.append(msg)
-                    
-                    if unique_results:
-                        context += "\nAdditional relevant messages found in history:\n"
-                        for msg in unique_results:
-                            context += f"{msg['role'].title()}: {msg['content']}\n"
+        
+        context = self.memory.budgeter.pack(
+            query,
+            facts=facts,
+            messages=messages,
+            extra_messages=search_results,
+            summary=summary
+        )
         
         return {
             "context": context,
@@ -390,9 +363,9 @@ class MultilingualAgentChatbot:
        
         self.api_key = api_key or f"api_key_{datetime.now().strftime('%Y%m%d%H%M%S')}"
         self.language = language
-        self.memory = ChatMemory(api_key=self.api_key)
-        self.memory.initialize_session(language)
         self.llm = GeminiLLM()
+        self.memory = ChatMemory(api_key=self.api_key, budgeter=ContextBudgeter(llm=self.llm))
+        self.memory.initialize_session(language)
         
       
         self.memory_agent = MemoryRetrievalAgent(self.llm, self.memory)
@@ -401,22 +374,29 @@ class MultilingualAgentChatbot:
         system_prompt = f"You are a multilingual chatbot. Respond to all my messages in {language}. Be friendly and helpful."
         welcome_message = f"I'll be your multilingual assistant, responding in {language}. How can I help you today?"
         
-       
-        self.memory.add_message("system", system_prompt)
-        self.memory.add_message("assistant", welcome_message)
+        # The session may already have history from another worker or an earlier run
+        self.memory.seed_messages([("system", system_prompt), ("assistant", welcome_message)])
         
         
-        self.response_agent = self._create_response_agent()
+        self._response_agent = None
+    
+    @property
+    def response_agent(self):
+        if self._response_agent is None:
+            self._response_agent = self._create_response_agent()
+        return self._response_agent
         
     def _create_response_agent(self):
         """Create a smart agent that can use web search when needed"""
+        from crewai import Agent
+        
         smart_agent = Agent(
             role=f"Multilingual {self.language} Assistant",
             goal=f"Provide accurate and helpful responses in {self.language} while maintaining conversation context",
             backstory=f"You are a knowledgeable assistant who responds in {self.language}. "
                       f"You first try to answer questions using your own knowledge. "
                       f"If you don't know the answer, you use web search to find information.",
-            tools=[serper_tool],
+            tools=[get_serper_tool()],
             llm=self.llm,
             verbose=True
         )
@@ -444,7 +424,7 @@ class MultilingualAgentChatbot:
         ]
         
         try:
-            response = self.llm.generate(messages)
+            response = self.llm.generate(messages, cache=True)
             
             # Extract JSON array from response
             import re
@@ -456,22 +436,13 @@ class MultilingualAgentChatbot:
             print(f"Error in fact extraction: {str(e)}")
         
         
-        facts = []
-        
-        
-        if "my name is" in message.lower() or "i am called" in message.lower():
-            facts.append(f"User's name mentioned in message: '{message}'")
-        
-        if "i like" in message.lower() or "i enjoy" in message.lower() or "i love" in message.lower():
-            facts.append(f"User's preference mentioned: '{message}'")
-            
-        if "i live in" in message.lower() or "i'm from" in message.lower() or "i am from" in message.lower():
-            facts.append(f"User's location mentioned: '{message}'")
-            
-        return facts
+        # Fall back to pattern-based extraction of short, slot-shaped facts
+        return heuristic_facts(message)
     
     def send_message(self, user_message):
         """Process user message and generate response using intelligent memory usage"""
+        from crewai import Task, Crew, Process
+        
      
         facts = self.extract_possible_facts(user_message)
         for fact in facts:
@@ -485,8 +456,7 @@ class MultilingualAgentChatbot:
         relevant_context = memory_result["context"]
         memory_decision = memory_result["decision"]
         
-        # Log memory usage (for debugging)
-        print(f"Memory usage: {memory_decision['explanation']}")
+        logger.debug("Memory usage: %s", memory_decision["explanation"])
         
         # Always include at least the most recent messages for continuity
         recent_messages = ""
@@ -511,7 +481,7 @@ class MultilingualAgentChatbot:
         
         search_decision = "no"
         try:
-            search_response = self.llm.generate(search_decision_messages)
+            search_response = self.llm.generate(search_decision_messages, cache=True)
             if "yes" in search_response.lower():
                 search_decision = "yes"
         except:
@@ -549,7 +519,8 @@ class MultilingualAgentChatbot:
             process=Process.sequential
         )
         
-        result = crew.kickoff()
+        with surface_timeouts():
+            result = crew.kickoff()
         
         # Extract response
         if hasattr(result, 'raw_output'):
@@ -562,32 +533,30 @@ class MultilingualAgentChatbot:
         # Add response to memory
         self.memory.add_message("assistant", response)
         
+        # Fold older turns into the rolling summary off the request path
+        self.memory.budgeter.maybe_refresh_summary(self.memory)
+        
         return response
     
-    def get_history(self):
-        """Return the complete chat history"""
-        return self.memory.get_session_history()
+    def get_history(self, limit=50, before=None, after=None, since=None):
+        """Return one page of the chat history and whether more messages lie beyond it"""
+        return self.memory.get_history_page(limit, before, after, since)
     
     def get_debug_info(self):
-        """Return debug information about this chatbot instance"""
-        facts = self.memory.get_facts()
-        history = self.memory.get_session_history()
-        
-        return {
-            "api_key": self.api_key,
-            "language": self.language,
-            "facts_count": len(facts),
-            "conversation_turns": len(history) // 2,
-            "recent_facts": [fact["content"] for fact in facts[-3:]] if facts else [],
-            "recent_messages": [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in self.memory.get_recent_messages(3)
-            ]
-        }
+        """Return debug information about this chatbot's session"""
+        return self.memory.get_debug_info()
 
 # Store active chatbot instances
 chatbot_instances = {}
 
+# Turns for one api_key run in order; different api_keys run in parallel
+session_locks = SessionLocks(max_waiting=int(os.getenv("CHAT_MAX_QUEUED_TURNS", "8")))
+
+router = APIRouter()
+
+# Estimated model calls per request (fact extraction, memory routing, search ranking and the reply) and priority
+ADMISSION_COSTS = {("POST", "/chat"): (4, INTERACTIVE)}
+
 def get_or_create_chatbot(api_key=None, language="English"):
     """Get an existing chatbot instance or create a new one"""
     
@@ -605,31 +574,41 @@ def get_or_create_chatbot(api_key=None, language="English"):
     return chatbot_instances[api_key]
 
 
-@app.post("/chat", response_model=ChatResponse)
+@router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
-    try:
-        
-        chatbot = get_or_create_chatbot(request.api_key, request.language)
-        
-       
+    api_key = request.api_key or "default_api_key"
+    
+    def run_turn():
+        chatbot = get_or_create_chatbot(api_key, request.language)
         response = chatbot.send_message(request.query)
+        return response, chatbot.get_debug_info() if request.debug else None
+    
+    try:
+        with request_context(INTERACTIVE, user=api_key):
+            # The turn makes blocking model calls, so run it off the event loop
+            response, debug_info = await session_locks.run(api_key, run_turn)
         
-        
-        if request.debug:
-            return ChatResponse(
-                response=response,
-                debug_info=chatbot.get_debug_info()
-            )
-        else:
-            return ChatResponse(response=response)
+        return ChatResponse(response=response, debug_info=debug_info)
     
+    except SessionBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except SchedulerTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=e.headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing request: {str(e)}"
         )
 
-@app.post("/add-fact")
+@router.post("/add-fact")
 async def add_fact(request: Request):
     data = await request.json()
     api_key = data.get("api_key", "default_api_key")
@@ -641,33 +620,112 @@ async def add_fact(request: Request):
             detail="Fact is required"
         )
     
-  
-    if api_key in chatbot_instances:
-        chatbot = chatbot_instances[api_key]
-        chatbot.memory.add_fact(fact)
+    # Resolve the session through the shared store, so any worker can take the fact
+    memory = ChatMemory(api_key=api_key)
+    if await asyncio.to_thread(memory.store.get_session, api_key) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No session found for this API key"
+        )
+    # Wait for any running turn so the fact lands between turns, not inside one
+    try:
+        added = await session_locks.run(api_key, memory.add_fact, fact)
+    except SessionBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    if added:
         return {"success": True, "message": f"Fact added: {fact}"}
-    else:
+    return {"success": True, "message": f"Fact already known: {fact}"}
+
+@router.get("/history", response_model=HistoryResponse)
+async def history(
+    api_key: str,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    since: Optional[str] = None
+):
+    """Page through a session's messages, newest page first unless `after` or `since` is given"""
+    if before is not None and after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after, not both"
+        )
+    
+    # Read straight from the shared store, so any worker can serve any session
+    store = get_chat_store()
+    
+    def load():
+        if store.get_session(api_key) is None:
+            return None
+        messages, has_more = store.get_page(api_key, limit, before, after, since)
+        return messages, has_more, store.count_messages(api_key)
+    
+    page = await asyncio.to_thread(load)
+    if page is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No active session found for this API key"
+            detail="No session found for this API key"
         )
-
-@app.post("/debug", response_model=Dict[str, Any])
+    messages, has_more, total = page
+    return HistoryResponse(
+        api_key=api_key,
+        messages=messages,
+        total=total,
+        has_more=has_more,
+        older_cursor=messages[0]["seq"] if messages else before,
+        newer_cursor=messages[-1]["seq"] if messages else after
+    )
+
+@router.post("/debug", response_model=Dict[str, Any])
 async def debug_endpoint(request: DebugRequest):
-    api_key = request.api_key
+    def load():
+        # Read from the shared store, so any worker can serve any session
+        memory = ChatMemory(api_key=request.api_key)
+        if memory.store.get_session(request.api_key) is None:
+            return None
+        return memory.get_debug_info()
     
-    if api_key in chatbot_instances:
-        return chatbot_instances[api_key].get_debug_info()
-    else:
+    info = await asyncio.to_thread(load)
+    if info is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No active session found for this API key"
+            detail="No session found for this API key"
         )
+    return info
 
-@app.get("/")
+@router.get("/")
 async def root():
     return {"message": "Multilingual Agent Chatbot API is running. Send POST requests to /chat endpoint."}
 
 
-import uvicorn
-uvicorn.run(app, host="localhost", port=8001)
+def create_app():
+    """Build the chatbot app; crewai and the search tool are only loaded on the first chat"""
+    app = FastAPI(title="Multilingual Agent Chatbot API")
+    
+    # Added before CORS so shed requests still carry CORS headers
+    admit_requests(app, ADMISSION_COSTS)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[TRACE_HEADER, "Retry-After"],
+    )
+    
+    instrument_app(app, "chatbot")
+    app.include_router(router)
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="localhost", port=8001)
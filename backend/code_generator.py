@@ -1,88 +1,163 @@
-
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import re
 import os
-from typing import Dict, Any, List
-from crewai import Agent, Task, Crew, Process
-import litellm
+import json
+import time
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from code_threads import CodeThreadStore
+from code_validation import DEFAULT_SANDBOX_IMAGE, build_repair_messages, validate_block, validate_blocks
+from llm_client import GeminiLLM
+from markdown_fences import FenceStream, split_markdown, tokenize_fences
+from session_locks import SessionBusy, SessionLocks
+from single_flight import SingleFlight, normalize_key
+from instrumentation import TRACE_HEADER, CrewTaskTimer, instrument_app
+from admission import admit_requests
+from llm_scheduler import NORMAL, SchedulerTimeout, request_context, surface_timeouts
 from datetime import datetime
 
-os.environ["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY")
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="CrewAI Code Generator API")
+# Running generated code is off unless the server opts in with CODE_EXECUTION_SANDBOX=docker;
+# otherwise run_code is ignored and blocks are only compiled
+EXECUTION_SANDBOX = os.getenv("CODE_EXECUTION_SANDBOX", "").strip().lower()
+SANDBOX_IMAGE = os.getenv("CODE_SANDBOX_IMAGE", DEFAULT_SANDBOX_IMAGE)
+SANDBOX_TIMEOUT = float(os.getenv("CODE_SANDBOX_TIMEOUT", "5"))
+SANDBOX_MEMORY_MB = int(os.getenv("CODE_SANDBOX_MEMORY_MB", "256"))
 
+# Identical fresh prompts that arrive while a crew is running share its result
+generation_flight = SingleFlight()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],  
-    allow_headers=["*"],  
-)
-
-class GeminiLLM:
-    def __init__(self, model_name="gemini/gemini-2.0-flash-lite"):
-        self.model_name = model_name
-    
-    def generate(self, messages):
-        response = litellm.completion(
-            model=self.model_name,
-            messages=messages
-        )
-        return response.choices[0].message.content
-        
-    def chat(self, messages):
-        return self.generate(messages)
+# Refinements of one thread run one at a time, so each builds on the code the previous one saved
+thread_locks = SessionLocks(max_waiting=int(os.getenv("CODE_MAX_QUEUED_REFINES", "4")))
 
 
 llm = GeminiLLM()
 
 
-code_generator = Agent(
-    role="Code Generator",
-    goal="Generate functional code based on user requirements",
-    backstory="""Experienced programmer fluent in multiple programming languages.
-    Creates functional code that addresses user requirements directly.""",
-    llm=llm,
-    verbose=True
-)
+CODE_GENERATOR_PROFILE = {
+    "role": "Code Generator",
+    "goal": "Generate functional code based on user requirements",
+    "backstory": """Experienced programmer fluent in multiple programming languages.
+    Creates functional code that addresses user requirements directly."""
+}
 
-code_optimizer = Agent(
-    role="Code Optimizer",
-    goal="Optimize and improve the generated code",
-    backstory="""Expert in code optimization and best practices.
-    Takes existing code and improves its efficiency, readability, and maintainability.""",
-    llm=llm,
-    verbose=True
-)
+CODE_OPTIMIZER_PROFILE = {
+    "role": "Code Optimizer",
+    "goal": "Optimize and improve the generated code",
+    "backstory": """Expert in code optimization and best practices.
+    Takes existing code and improves its efficiency, readability, and maintainability."""
+}
 
-def create_crew(user_prompt):
-    """Create and return a CrewAI Crew with all agents and tasks."""
+
+@lru_cache(maxsize=None)
+def get_agents():
+    """Build the CrewAI agents on first use, so importing this module doesn't load crewai"""
+    from crewai import Agent
     
-    generate_code_task = Task(
-        description=f"Generate code that satisfies this user request: '{user_prompt}'",
-        expected_output="""
+    code_generator = Agent(llm=llm, verbose=True, **CODE_GENERATOR_PROFILE)
+    code_optimizer = Agent(llm=llm, verbose=True, **CODE_OPTIMIZER_PROFILE)
+    return code_generator, code_optimizer
+
+
+@lru_cache(maxsize=None)
+def get_thread_store():
+    return CodeThreadStore(os.getenv("CODE_THREADS_DB", "code_threads.db"))
+
+GENERATE_CODE_DESCRIPTION = "Generate code that satisfies this user request: '{user_prompt}'"
+GENERATE_CODE_EXPECTED_OUTPUT = """
         Clean, well-documented code that fulfills the user's requirements.
         The code should be functional and address all aspects of the user's request.
-        """,
-        agent=code_generator
-    )
+        """
 
-    optimize_code_task = Task(
-        description="Optimize and improve the generated code. Also provide an explanation of how the code works.",
-        expected_output="""
+OPTIMIZE_CODE_DESCRIPTION = "Optimize and improve the generated code. Also provide an explanation of how the code works."
+OPTIMIZE_CODE_EXPECTED_OUTPUT = """
         Optimized version of the code with:
         - Improved efficiency
         - Better readability
         - Following best practices
         - Added error handling where appropriate
         Also include an explanation of how the code works and why certain decisions were made.
-        """,
+        """
+
+# When the optimizer is skipped, the draft has to carry the explanation itself
+DRAFT_EXPECTED_OUTPUT = GENERATE_CODE_EXPECTED_OUTPUT + """Follow the code with a short explanation of how it works.
+        """
+
+CODE_MODES = ("draft", "optimized", "auto")
+
+# Words that usually mean the user cares about what the optimizer adds; a trailing * marks a stem
+COMPLEXITY_KEYWORDS = (
+    "optimiz*", "efficien*", "performance", "fast", "scalab*", "production", "robust",
+    "error handling", "edge case", "secur*", "thread*", "concurren*", "async*", "parallel*",
+    "class", "api", "database", "server", "cache", "test", "refactor*", "best practice"
+)
+
+# Whole words may take a plural ending ("tests") but nothing else ("testing", "classify")
+COMPLEXITY_PATTERNS = [
+    (keyword.rstrip("*"), re.compile(
+        r"\b" + re.escape(keyword.rstrip("*")) + (r"\w*" if keyword.endswith("*") else r"(?:e?s)?\b")
+    ))
+    for keyword in COMPLEXITY_KEYWORDS
+]
+
+
+def choose_code_path(user_prompt, mode="auto"):
+    """Decide whether the optimizer pass runs; returns (path, reason)"""
+    if mode == "draft":
+        return "draft", "draft mode requested"
+    if mode == "optimized":
+        return "optimized", "optimized mode requested"
+    
+    prompt = user_prompt.lower()
+    words = len(prompt.split())
+    keywords = [keyword for keyword, pattern in COMPLEXITY_PATTERNS if pattern.search(prompt)]
+    requirements = prompt.count("\n") + prompt.count(";") + prompt.count(" and ") + prompt.count(",")
+    
+    if keywords:
+        return "optimized", f"prompt mentions {', '.join(keywords[:3])}"
+    if words > 30:
+        return "optimized", f"long prompt ({words} words)"
+    if requirements >= 3:
+        return "optimized", f"prompt lists {requirements + 1} requirements"
+    return "draft", f"short, simple prompt ({words} words)"
+
+
+def create_crew(user_prompt, optimize=True, task_callback=None):
+    """Create and return a CrewAI Crew with all agents and tasks."""
+    from crewai import Task, Crew, Process
+    
+    code_generator, code_optimizer = get_agents()
+    
+    generate_code_task = Task(
+        name="generate_code",
+        description=GENERATE_CODE_DESCRIPTION.format(user_prompt=user_prompt),
+        expected_output=GENERATE_CODE_EXPECTED_OUTPUT if optimize else DRAFT_EXPECTED_OUTPUT,
+        agent=code_generator,
+        callback=task_callback
+    )
+    
+    if not optimize:
+        return Crew(
+            agents=[code_generator],
+            tasks=[generate_code_task],
+            verbose=True,
+            process=Process.sequential
+        )
+
+    optimize_code_task = Task(
+        name="optimize_code",
+        description=OPTIMIZE_CODE_DESCRIPTION,
+        expected_output=OPTIMIZE_CODE_EXPECTED_OUTPUT,
         agent=code_optimizer,
-        context=[generate_code_task]
+        context=[generate_code_task],
+        callback=task_callback
     )
     
     crew = Crew(
@@ -99,9 +174,22 @@ def create_crew(user_prompt):
     )
     return crew
 
-def generate_optimized_code(user_prompt):
-    crew = create_crew(user_prompt)
-    result = crew.kickoff()
+def generate_optimized_code(user_prompt, mode="auto", validate=True, run_code=False):
+    path, reason = choose_code_path(user_prompt, mode)
+    
+    # Record when each task finishes to report per-stage latency
+    started = time.perf_counter()
+    finished = []
+    task_timer = CrewTaskTimer(lambda output: finished.append(time.perf_counter()))
+    crew = create_crew(
+        user_prompt,
+        optimize=(path == "optimized"),
+        task_callback=task_timer.task_done
+    )
+    task_timer.start(task.name for task in crew.tasks)
+    with surface_timeouts():
+        result = crew.kickoff()
+    total = time.perf_counter() - started
     
    
     if hasattr(result, 'raw_output'):
@@ -113,22 +201,37 @@ def generate_optimized_code(user_prompt):
         result_text = str(result)
     
     
-    code_pattern = re.compile(r'```(?:python|java|javascript|cpp|c|html|css)?\n(.*?)```', re.DOTALL)
-    code_matches = code_pattern.findall(result_text)
+    timings = {"total_seconds": round(total, 3)}
+    stage_names = ["generate_seconds", "optimize_seconds"]
+    previous = started
+    for name, timestamp in zip(stage_names, finished):
+        timings[name] = round(timestamp - previous, 3)
+        previous = timestamp
     
-   
-    if not code_matches:
+    response = parse_code_output(user_prompt, result_text)
+    if validate:
+        validation_started = time.perf_counter()
+        validate_and_repair(user_prompt, response, run_code)
+        timings["validate_seconds"] = round(time.perf_counter() - validation_started, 3)
+    response.update({"mode": path, "mode_reason": reason, "timings": timings})
+    return response
+
+
+def parse_code_output(user_prompt, result_text):
+    """Split model output into code blocks, an explanation and the message log"""
+    blocks, prose = split_markdown(result_text)
+    
+    if not blocks:
         code_blocks = [result_text]
+        languages = [None]
     else:
-        code_blocks = code_matches
+        code_blocks = [block["code"] for block in blocks]
+        languages = [block["language"] for block in blocks]
     
-   
+    # Only the prose after the last block is the explanation, as before
     explanation = "Code explanation not provided."
-    if code_matches:
-        last_code = code_matches[-1]
-        last_code_pos = result_text.rfind(last_code) + len(last_code) + 3  
-        if last_code_pos < len(result_text):
-            explanation = result_text[last_code_pos:].strip()
+    if blocks and prose[-1].strip():
+        explanation = prose[-1].strip()
     
     
     messages = [
@@ -146,13 +249,220 @@ def generate_optimized_code(user_prompt):
     
     return {
         "code_blocks": code_blocks,
+        "languages": languages,
+        "blocks": [
+            {k: block[k] for k in ("language", "code", "start", "end")}
+            for block in blocks
+        ],
         "explanation": explanation,
         "messages": messages
     }
 
 
+def validate_and_repair(user_prompt, response, run_code=False):
+    """Check generated Python blocks and fix only the failing ones with one repair call"""
+    run = run_code and EXECUTION_SANDBOX == "docker"
+    sandbox = {"run": run, "timeout": SANDBOX_TIMEOUT, "memory_mb": SANDBOX_MEMORY_MB, "image": SANDBOX_IMAGE}
+    blocks = list(zip(response["languages"], response["code_blocks"]))
+    report = validate_blocks(blocks, **sandbox)
+    failures = [r for r in report if r["status"] in ("failed", "timeout")]
+    
+    if failures:
+        try:
+            repaired_text = llm.generate(build_repair_messages(user_prompt, blocks, failures))
+            fixed = tokenize_fences(repaired_text)
+            # Fixes are matched to failures by position, so a reply with a different
+            # number of blocks can't be trusted and the originals are kept
+            if len(fixed) != len(failures):
+                logger.warning("Repair returned %d blocks for %d failures; keeping originals", len(fixed), len(failures))
+                fixed = []
+            for failure, block in zip(failures, fixed):
+                index = failure["index"]
+                language = response["languages"][index]
+                recheck = validate_block(index, language, block["code"], **sandbox)
+                if recheck["status"] in ("passed", "needs_input"):
+                    response["code_blocks"][index] = block["code"]
+                    if index < len(response["blocks"]):
+                        response["blocks"][index]["code"] = block["code"]
+                    recheck["repaired"] = True
+                    report[index] = recheck
+        except Exception:
+            logger.exception("Error repairing generated code")
+    
+    response["validation"] = report
+    return response
+
+
+def build_refine_messages(thread, user_prompt):
+    """Prompt for a follow-up on an existing thread: current code plus the requested change"""
+    current_code = "\n\n".join(
+        f"```{language or ''}\n{code}```"
+        for language, code in zip(thread["languages"], thread["code_blocks"])
+    )
+    return [
+        {
+            "role": "system",
+            "content": f"You are the {CODE_OPTIMIZER_PROFILE['role']}. {CODE_OPTIMIZER_PROFILE['backstory']}\n"
+                       "You are refining code you already wrote. Apply only the requested change "
+                       "and keep everything else as it is. Return the complete updated code in "
+                       "fenced blocks, in the same order, followed by a short 'Changes:' section "
+                       "that lists what you changed."
+        },
+        {
+            "role": "user",
+            "content": f"Current code:\n{current_code}\n\nRequested change: '{user_prompt}'"
+        }
+    ]
+
+
+def refine_code(thread, user_prompt, validate=True, run_code=False):
+    """Apply a follow-up prompt to a thread's current code with a single model call"""
+    started = time.perf_counter()
+    result_text = llm.generate(build_refine_messages(thread, user_prompt))
+    timings = {"refine_seconds": round(time.perf_counter() - started, 3)}
+    
+    response = parse_code_output(user_prompt, result_text)
+    if validate:
+        validation_started = time.perf_counter()
+        validate_and_repair(user_prompt, response, run_code)
+        timings["validate_seconds"] = round(time.perf_counter() - validation_started, 3)
+    timings["total_seconds"] = round(time.perf_counter() - started, 3)
+    
+    response.update({
+        "mode": "refine",
+        "mode_reason": "follow-up on an existing thread, generator stage skipped",
+        "timings": timings
+    })
+    return response
+
+
+def record_turn(thread_id, user_prompt, result):
+    """Save a generated or refined result to its thread and attach the thread's messages"""
+    thread_store = get_thread_store()
+    result["thread_id"] = thread_store.save_turn(thread_id, user_prompt, result)
+    result["messages"] = thread_store.get_messages(result["thread_id"])
+    return result
+
+
+def refine_thread(thread_id, user_prompt, validate=True, run_code=False):
+    """Refine a stored thread and save the turn; returns None if the thread is unknown.
+
+    Run it under the thread's lock: the current code is read, refined and
+    written back as one step, so concurrent follow-ups don't lose an edit.
+    """
+    thread = get_thread_store().get(thread_id)
+    if thread is None:
+        return None
+    return record_turn(thread_id, user_prompt, refine_code(thread, user_prompt, validate, run_code))
+
+
+def load_thread(thread_id):
+    """A thread's current code plus its message history, or None if unknown"""
+    thread_store = get_thread_store()
+    thread = thread_store.get(thread_id)
+    if thread is not None:
+        thread["messages"] = thread_store.get_messages(thread_id)
+    return thread
+
+
+def _agent_messages(profile, description, expected_output):
+    """Build a direct chat prompt equivalent to running the agent with `profile` on a single task"""
+    return [
+        {
+            "role": "system",
+            "content": f"You are the {profile['role']}. {profile['backstory']}\nYour goal: {profile['goal']}"
+        },
+        {
+            "role": "user",
+            "content": f"{description}\n\nExpected output:{expected_output}"
+        }
+    ]
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_stage(stage, messages, output):
+    """Stream one generation stage as SSE events, collecting the full text in `output`"""
+    yield _sse("stage", {"stage": stage, "status": "started"})
+    fences = FenceStream()
+    parts = []
+    block_index = 0
+    async for delta in llm.astream(messages):
+        parts.append(delta)
+        yield _sse("delta", {"stage": stage, "text": delta})
+        for block in fences.feed(delta):
+            yield _sse("code_block", {"stage": stage, "index": block_index, **block})
+            block_index += 1
+    for block in fences.close():
+        yield _sse("code_block", {"stage": stage, "index": block_index, **block})
+        block_index += 1
+    output[stage] = "".join(parts)
+    yield _sse("stage", {"stage": stage, "status": "completed"})
+
+
+async def _finish_stream(user_prompt, text, validate, run_code):
+    result = parse_code_output(user_prompt, text)
+    if validate:
+        # Parsing, sandbox runs and the repair call block, so keep them off the event loop
+        await asyncio.to_thread(validate_and_repair, user_prompt, result, run_code)
+    return result
+
+
+async def stream_optimized_code(user_prompt, mode="auto", validate=True, run_code=False):
+    """Yield SSE events for the draft and then the optimized code as they are generated"""
+    path, reason = choose_code_path(user_prompt, mode)
+    output = {}
+    timings = {}
+    with request_context(NORMAL):
+        try:
+            yield _sse("mode", {"mode": path, "mode_reason": reason})
+            started = time.perf_counter()
+            draft_messages = _agent_messages(
+                CODE_GENERATOR_PROFILE,
+                GENERATE_CODE_DESCRIPTION.format(user_prompt=user_prompt),
+                GENERATE_CODE_EXPECTED_OUTPUT if path == "optimized" else DRAFT_EXPECTED_OUTPUT
+            )
+            async for event in _stream_stage("draft", draft_messages, output):
+                yield event
+            timings["generate_seconds"] = round(time.perf_counter() - started, 3)
+            
+            if path == "draft":
+                result = await _finish_stream(user_prompt, output["draft"], validate, run_code)
+                timings["total_seconds"] = round(time.perf_counter() - started, 3)
+                result.update({"mode": path, "mode_reason": reason, "timings": timings})
+                yield _sse("done", result)
+                return
+            
+            optimize_started = time.perf_counter()
+            optimize_messages = _agent_messages(
+                CODE_OPTIMIZER_PROFILE,
+                f"{OPTIMIZE_CODE_DESCRIPTION}\n\nUser request: '{user_prompt}'\n\n"
+                f"Generated code:\n{output['draft']}",
+                OPTIMIZE_CODE_EXPECTED_OUTPUT
+            )
+            async for event in _stream_stage("optimized", optimize_messages, output):
+                yield event
+            timings["optimize_seconds"] = round(time.perf_counter() - optimize_started, 3)
+            
+            result = await _finish_stream(user_prompt, output["optimized"], validate, run_code)
+            timings["total_seconds"] = round(time.perf_counter() - started, 3)
+            result.update({"mode": path, "mode_reason": reason, "timings": timings})
+            yield _sse("done", result)
+        except SchedulerTimeout as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error generating code: {str(e)}"})
+
+
 class PromptRequest(BaseModel):
     prompt: str
+    thread_id: Optional[str] = None
+    mode: str = "auto"
+    validate_code: bool = True
+    # Only honoured when the server sets CODE_EXECUTION_SANDBOX=docker
+    run_code: bool = False
 
 
 class Message(BaseModel):
@@ -161,25 +471,138 @@ class Message(BaseModel):
     timestamp: str
 
 
+class CodeBlock(BaseModel):
+    language: Optional[str] = None
+    code: str
+    start: int
+    end: int
+
+
+class BlockValidation(BaseModel):
+    index: int
+    language: Optional[str] = None
+    status: str
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    repaired: bool = False
+
+
 class CodeResponse(BaseModel):
     code_blocks: List[str]
     explanation: str
     messages: List[Message]
+    mode: Optional[str] = None
+    mode_reason: Optional[str] = None
+    timings: Dict[str, float] = {}
+    validation: List[BlockValidation] = []
+    blocks: List[CodeBlock] = []
+    thread_id: Optional[str] = None
+
+
+router = APIRouter()
 
-@app.post("/generate-code/", response_model=CodeResponse)
+# Estimated model calls per request (the generate and optimize agent tasks) and priority
+ADMISSION_COSTS = {
+    ("POST", "/generate-code/"): (2, NORMAL),
+    ("POST", "/generate-code/stream"): (2, NORMAL),
+}
+
+@router.post("/generate-code/", response_model=CodeResponse)
 async def generate_code(request: PromptRequest):
     try:
         if not request.prompt or request.prompt.strip() == "":
             raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+        if request.mode not in CODE_MODES:
+            raise HTTPException(status_code=400, detail=f"Mode must be one of {list(CODE_MODES)}")
+        
+        with request_context(NORMAL):
+            if request.thread_id:
+                result = await thread_locks.run(
+                    request.thread_id, refine_thread,
+                    request.thread_id, request.prompt, request.validate_code, request.run_code
+                )
+                if result is None:
+                    raise HTTPException(status_code=404, detail="Unknown thread_id")
+                return result
+            
+            result = await generation_flight.run(
+                normalize_key("code", request.prompt, request.mode,
+                              request.validate_code, request.run_code),
+                generate_optimized_code,
+                request.prompt, request.mode, request.validate_code, request.run_code
+            )
         
-        result = generate_optimized_code(request.prompt)
-        return result
+        # Callers sharing a flight each start their own thread, so each records a copy
+        return await asyncio.to_thread(record_turn, None, request.prompt, dict(result))
+    except HTTPException:
+        raise
+    except SessionBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    except SchedulerTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating code: {str(e)}")
 
-@app.get("/health/")
+@router.post("/generate-code/stream")
+async def generate_code_stream(request: PromptRequest):
+    """
+    Server-sent events variant of /generate-code/.
+    
+    Emits `delta` events while the draft and the optimized version are written,
+    a `code_block` event whenever a fenced block closes, and a final `done`
+    event carrying the same payload as CodeResponse.
+    """
+    if not request.prompt or request.prompt.strip() == "":
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+    if request.mode not in CODE_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of {list(CODE_MODES)}")
+    
+    return StreamingResponse(
+        stream_optimized_code(request.prompt, request.mode, request.validate_code, request.run_code),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/threads/{thread_id}")
+async def get_thread(thread_id: str):
+    """Return a code thread's current code and its message history"""
+    thread = await asyncio.to_thread(load_thread, thread_id)
+    if thread is None:
+        raise HTTPException(status_code=404, detail="Unknown thread_id")
+    return thread
+
+@router.get("/health/")
 async def health_check():
     return {"status": "healthy"}
 
-import uvicorn
-uvicorn.run(app, host="localhost", port=8008)
+
+def create_app():
+    """Build the code generator app; nothing heavy is loaded until the first request"""
+    app = FastAPI(title="CrewAI Code Generator API")
+    
+    # Added before CORS so shed requests still carry CORS headers
+    admit_requests(app, ADMISSION_COSTS)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  
+        allow_credentials=True,
+        allow_methods=["*"],  
+        allow_headers=["*"],  
+        expose_headers=[TRACE_HEADER, "Retry-After"],
+    )
+    
+    instrument_app(app, "code_generator")
+    app.include_router(router)
+    return app
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="localhost", port=8008)
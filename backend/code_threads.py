@@ -0,0 +1,97 @@
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+
+class CodeThreadStore:
+    """Small SQLite store that keeps the latest code and message log per code thread"""
+
+    def __init__(self, db_path="code_threads.db", max_messages=50):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS threads (
+                    id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    code_blocks TEXT NOT NULL,
+                    languages TEXT NOT NULL,
+                    explanation TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS thread_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    thread_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_thread_messages_thread
+                    ON thread_messages (thread_id, id);
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def get(self, thread_id):
+        """Return the thread's latest code and explanation, or None if unknown"""
+        row = self._connect().execute(
+            "SELECT * FROM threads WHERE id = ?", (thread_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "thread_id": row["id"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "code_blocks": json.loads(row["code_blocks"]),
+            "languages": json.loads(row["languages"]),
+            "explanation": row["explanation"]
+        }
+
+    def get_messages(self, thread_id, limit=None):
+        """Return the thread's messages, oldest first, optionally only the last `limit`"""
+        rows = self._connect().execute(
+            "SELECT role, content, timestamp FROM thread_messages "
+            "WHERE thread_id = ? ORDER BY id DESC LIMIT ?",
+            (thread_id, limit or self.max_messages)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def save_turn(self, thread_id, prompt, response):
+        """Record one prompt/response round and replace the thread's current code.
+
+        Creates the thread when `thread_id` is None; returns the thread id.
+        """
+        now = datetime.now().isoformat()
+        thread_id = thread_id or uuid.uuid4().hex
+        summary = f"Generated {len(response['code_blocks'])} code block(s) ({response.get('mode', 'optimized')})."
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO threads (id, created_at, updated_at, code_blocks, languages, explanation) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at, "
+                "code_blocks = excluded.code_blocks, languages = excluded.languages, "
+                "explanation = excluded.explanation",
+                (thread_id, now, now, json.dumps(response["code_blocks"]),
+                 json.dumps(response["languages"]), response["explanation"])
+            )
+            conn.executemany(
+                "INSERT INTO thread_messages (thread_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                [(thread_id, "user", prompt, now), (thread_id, "system", summary, now)]
+            )
+            # Keep only the most recent messages so threads stay compact
+            conn.execute(
+                "DELETE FROM thread_messages WHERE thread_id = ? AND id NOT IN ("
+                "SELECT id FROM thread_messages WHERE thread_id = ? ORDER BY id DESC LIMIT ?)",
+                (thread_id, thread_id, self.max_messages)
+            )
+        return thread_id
@@ -0,0 +1,161 @@
+import os
+import re
+import uuid
+import logging
+import tempfile
+import subprocess
+
+
+logger = logging.getLogger(__name__)
+
+PYTHON_TAGS = {"python", "py", "python3"}
+MAX_OUTPUT_CHARS = 2000
+DEFAULT_SANDBOX_IMAGE = "python:3.11-slim"
+
+
+def is_python(language):
+    return (language or "").lower() in PYTHON_TAGS
+
+
+def check_syntax(code):
+    """Compile a Python block without running it; returns None or an error description"""
+    try:
+        # compile() also catches what ast.parse lets through, e.g. `return` outside a function
+        compile(code, "<generated>", "exec", dont_inherit=True)
+        return None
+    except SyntaxError as e:
+        return f"{type(e).__name__}: {e.msg} (line {e.lineno})"
+    except ValueError as e:
+        return f"ValueError: {e}"
+
+
+def _docker_command(name, workdir, image, memory_mb, timeout):
+    """`docker run` for one block: no network, read-only root, no capabilities, unprivileged user"""
+    return [
+        "docker", "run", "--rm", "--name", name,
+        "--network", "none",
+        "--read-only", "--tmpfs", "/tmp:rw,size=16m",
+        "--memory", f"{memory_mb}m", "--memory-swap", f"{memory_mb}m",
+        "--cpus", "1", "--pids-limit", "64",
+        "--cap-drop", "ALL", "--security-opt", "no-new-privileges",
+        "--user", "65534:65534",
+        "--ulimit", f"cpu={int(timeout) + 1}",
+        "--env", "PYTHONIOENCODING=utf-8",
+        "--volume", f"{workdir}:/sandbox:ro",
+        "--workdir", "/tmp",
+        image, "python", "-I", "-B", "/sandbox/main.py",
+    ]
+
+
+def run_sandboxed(code, timeout=5.0, memory_mb=256, image=DEFAULT_SANDBOX_IMAGE):
+    """Run a Python block in a throwaway Docker container with no network and a read-only filesystem.
+
+    Returns a dict with `status` ("passed", "failed", "timeout",
+    "needs_input" or "unavailable"), the exit code and truncated stdout/stderr.
+    """
+    name = f"codegen-sandbox-{uuid.uuid4().hex[:12]}"
+    with tempfile.TemporaryDirectory(prefix="codegen-sandbox-") as workdir:
+        os.chmod(workdir, 0o755)
+        script = os.path.join(workdir, "main.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(code)
+        os.chmod(script, 0o644)
+
+        try:
+            process = subprocess.Popen(
+                _docker_command(name, workdir, image, memory_mb, timeout),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+        except OSError as e:
+            return {"status": "unavailable", "exit_code": None, "stdout": "",
+                    "stderr": f"Sandbox unavailable: {e}"}
+        try:
+            # Container start-up isn't the program's fault, so it gets a few extra seconds
+            stdout, stderr = process.communicate(timeout=timeout + 5)
+        except subprocess.TimeoutExpired:
+            subprocess.run(["docker", "kill", name], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=10)
+            stdout, stderr = process.communicate()
+            return {
+                "status": "timeout",
+                "exit_code": None,
+                "stdout": stdout[-MAX_OUTPUT_CHARS:],
+                "stderr": f"Timed out after {timeout}s"
+            }
+
+    # docker run exits with 125-127 when the container itself couldn't start
+    if process.returncode in (125, 126, 127):
+        return {"status": "unavailable", "exit_code": process.returncode, "stdout": "",
+                "stderr": "Sandbox unavailable: " + (stderr.strip().splitlines() or ["docker run failed"])[-1]}
+    status = "passed" if process.returncode == 0 else "failed"
+    # Interactive programs read from stdin, which is closed in the sandbox
+    if status == "failed" and re.search(r"\bEOFError\b", stderr):
+        status = "needs_input"
+    return {
+        "status": status,
+        "exit_code": process.returncode,
+        "stdout": stdout[-MAX_OUTPUT_CHARS:],
+        "stderr": stderr[-MAX_OUTPUT_CHARS:]
+    }
+
+
+def validate_block(index, language, code, run=False, timeout=5.0, memory_mb=256, image=DEFAULT_SANDBOX_IMAGE):
+    """Validate one code block; non-Python blocks are reported as skipped.
+
+    Blocks are only compiled unless `run` is set, and `run` should only be
+    set when the server has opted into the container sandbox.
+    """
+    result = {"index": index, "language": language, "status": "skipped", "stage": None, "error": None}
+    if not is_python(language):
+        return result
+
+    error = check_syntax(code)
+    if error:
+        result.update({"status": "failed", "stage": "parse", "error": error})
+        return result
+
+    result.update({"status": "passed", "stage": "parse"})
+    if run:
+        outcome = run_sandboxed(code, timeout=timeout, memory_mb=memory_mb, image=image)
+        if outcome["status"] == "unavailable":
+            # Keep the compile result rather than blaming the code for a missing sandbox
+            logger.warning("Sandbox unavailable, keeping the compile result: %s", outcome["stderr"].strip())
+            return result
+        result["stage"] = "run"
+        result["status"] = outcome["status"]
+        if outcome["status"] in ("failed", "timeout"):
+            result["error"] = outcome["stderr"].strip().splitlines()[-1] if outcome["stderr"].strip() else "Process failed"
+    return result
+
+
+def validate_blocks(blocks, run=False, timeout=5.0, memory_mb=256, image=DEFAULT_SANDBOX_IMAGE):
+    """Validate `(language, code)` pairs in order"""
+    return [
+        validate_block(i, language, code, run=run, timeout=timeout, memory_mb=memory_mb, image=image)
+        for i, (language, code) in enumerate(blocks)
+    ]
+
+
+def build_repair_messages(user_prompt, blocks, failures):
+    """Prompt asking the model to fix only the failing blocks"""
+    sections = []
+    for failure in failures:
+        language, code = blocks[failure["index"]]
+        sections.append(
+            f"Block {failure['index']} failed at the {failure['stage']} stage with: {failure['error']}\n"
+            f"```{language or ''}\n{code}```"
+        )
+    return [
+        {
+            "role": "system",
+            "content": "You fix broken code. Return only the corrected code blocks, each in its own "
+                       "fenced block, in the same order as given. Do not add explanations."
+        },
+        {
+            "role": "user",
+            "content": f"Original request: '{user_prompt}'\n\n" + "\n\n".join(sections)
+        }
+    ]
@@ -0,0 +1,195 @@
+import re
+import threading
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for budgeting prompts"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def _terms(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _normalize(text):
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def dedupe_facts(facts):
+    """Drop facts whose normalized text was already seen, keeping the newest copy"""
+    seen = set()
+    unique = []
+    for fact in reversed(facts):
+        key = _normalize(fact["content"])
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(fact)
+    unique.reverse()
+    return unique
+
+
+class ContextBudgeter:
+    """Packs facts, a rolling summary and conversation turns into a fixed token budget.
+
+    Older turns are folded into a rolling summary in the background every
+    `summary_every` messages, so the prompt only carries the summary plus the
+    unsummarized tail of the conversation.
+    """
+
+    def __init__(self, llm=None, token_budget=1200, summary_every=10,
+                 keep_recent=6, facts_share=0.25, summary_max_tokens=250):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.summary_every = summary_every
+        self.keep_recent = keep_recent
+        self.facts_share = facts_share
+        self.summary_max_tokens = summary_max_tokens
+        self._summarizing = set()
+        self._lock = threading.Lock()
+
+    def _relevance(self, query_terms, text):
+        if not query_terms:
+            return 0.0
+        return len(query_terms & _terms(text)) / len(query_terms)
+
+    def _truncate(self, text, max_tokens):
+        max_chars = max_tokens * 4
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars - 3].rstrip() + "..."
+
+    def pack(self, query, facts=(), messages=(), extra_messages=(), summary=None,
+             token_budget=None):
+        """Build a memory context string that never exceeds the token budget.
+
+        Facts are deduplicated and packed most relevant first. Conversation
+        messages are packed newest first (with relevance as a tie-breaker for
+        `extra_messages`) and rendered back in chronological order.
+        """
+        budget = token_budget or self.token_budget
+        query_terms = _terms(query or "")
+        remaining = budget
+        sections = []
+
+        if summary:
+            text = self._truncate(summary, min(self.summary_max_tokens, remaining))
+            sections.append("Summary of earlier conversation:\n" + text + "\n")
+            remaining -= estimate_tokens(sections[-1])
+
+        facts = dedupe_facts(list(facts))
+        if facts and remaining > 0:
+            fact_budget = int(budget * self.facts_share)
+            ranked = sorted(
+                enumerate(facts),
+                key=lambda item: (self._relevance(query_terms, item[1]["content"]), item[0]),
+                reverse=True,
+            )
+            chosen = []
+            used = estimate_tokens("Facts about the user:\n")
+            for index, fact in ranked:
+                cost = estimate_tokens(f"- {fact['content']}\n")
+                if used + cost > fact_budget or used + cost > remaining:
+                    continue
+                chosen.append((index, fact))
+                used += cost
+            if chosen:
+                chosen.sort(key=lambda item: item[0])
+                block = "Facts about the user:\n"
+                block += "".join(f"- {fact['content']}\n" for _, fact in chosen)
+                sections.append(block + "\n")
+                remaining -= estimate_tokens(sections[-1])
+
+        history = self._pack_messages(list(messages), remaining, newest_first=True,
+                                      query_terms=query_terms)
+        if history:
+            block = "Relevant conversation history:\n" + self._render(history)
+            sections.append(block)
+            remaining -= estimate_tokens(block)
+
+        extra = [msg for msg in extra_messages if msg not in messages]
+        extra = self._pack_messages(extra, remaining, newest_first=False,
+                                    query_terms=query_terms)
+        if extra:
+            sections.append("\nAdditional relevant messages found in history:\n"
+                            + self._render(extra))
+
+        return "".join(sections)
+
+    def _pack_messages(self, messages, remaining, newest_first, query_terms):
+        if not messages or remaining <= 0:
+            return []
+        header = estimate_tokens("Relevant conversation history:\n")
+        used = header
+        order = list(range(len(messages)))
+        if newest_first:
+            order.reverse()
+        else:
+            order.sort(key=lambda i: self._relevance(query_terms, messages[i]["content"]),
+                       reverse=True)
+        chosen = []
+        for i in order:
+            cost = estimate_tokens(self._render([messages[i]]))
+            if used + cost > remaining:
+                if newest_first:
+                    break
+                continue
+            chosen.append(i)
+            used += cost
+        return [messages[i] for i in sorted(chosen)]
+
+    def _render(self, messages):
+        return "".join(f"{msg['role'].title()}: {msg['content']}\n" for msg in messages)
+
+    def unsummarized(self, memory):
+        """Return the messages that are not yet covered by the rolling summary"""
+        return memory.get_messages(memory.get_summary()["covered"])
+
+    def maybe_refresh_summary(self, memory, background=True):
+        """Fold older turns into the rolling summary once enough new ones piled up"""
+        if self.llm is None:
+            return False
+        covered = memory.get_summary()["covered"]
+        target = memory.message_count() - self.keep_recent
+        if target - covered < self.summary_every:
+            return False
+        # Catch up in bounded chunks so the summarization prompt stays small too
+        target = min(target, covered + self.summary_every * 3)
+
+        with self._lock:
+            if memory.api_key in self._summarizing:
+                return False
+            self._summarizing.add(memory.api_key)
+
+        if background:
+            threading.Thread(target=self._refresh_summary, args=(memory, covered, target),
+                             daemon=True).start()
+        else:
+            self._refresh_summary(memory, covered, target)
+        return True
+
+    def _refresh_summary(self, memory, covered, target):
+        try:
+            previous = memory.get_summary()["content"]
+            new_messages = memory.get_messages(covered, target)
+            system_prompt = f"""
+            You maintain a running summary of a conversation between a user and an assistant.
+            Merge the new messages into the existing summary. Keep names, preferences,
+            decisions and open questions; drop small talk. Use at most {self.summary_max_tokens * 3 // 4} words.
+            Respond with the updated summary only.
+            """
+            prompt = (
+                f"Existing summary:\n{previous or '(none)'}\n\n"
+                f"New messages:\n{self._render(new_messages)}"
+            )
+            summary = self.llm.generate([
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ])
+            memory.set_summary(self._truncate(summary.strip(), self.summary_max_tokens), target)
+        except Exception as e:
+            print(f"Error refreshing conversation summary: {str(e)}")
+        finally:
+            with self._lock:
+                self._summarizing.discard(memory.api_key)
@@ -0,0 +1,300 @@
+import os
+import json
+import errno
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import APIRouter, HTTPException
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+
+class JobStore:
+    """SQLite table of jobs so status and results survive restarts and are visible to every worker"""
+
+    def __init__(self, db_path="jobs.db"):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    current_task TEXT,
+                    tasks_completed INTEGER NOT NULL DEFAULT 0,
+                    total_tasks INTEGER,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker_pid INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs (kind, status);
+            """)
+            try:
+                # Tables created before jobs recorded the process running them
+                conn.execute("ALTER TABLE jobs ADD COLUMN worker_pid INTEGER")
+            except sqlite3.OperationalError:
+                pass
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, now, now)
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        for key in ("result", "params"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim(self, job_id):
+        """Move a queued job to running; False if it was cancelled or already taken"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, os.getpid(), datetime.now().isoformat(), job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def request_cancel(self, job_id):
+        """Flag a job for cancellation; queued jobs are cancelled immediately"""
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN status = ? THEN ? ELSE status END, "
+                "cancel_requested = 1, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (QUEUED, CANCELLED, now, job_id, QUEUED, RUNNING)
+            )
+
+    def cancel_requested(self, job_id):
+        row = self._connect().execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if unknown"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def unfinished(self, kind):
+        rows = self._connect().execute(
+            "SELECT id, status, worker_pid FROM jobs WHERE kind = ? AND status IN (?, ?) ORDER BY created_at",
+            (kind, QUEUED, RUNNING)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class JobProgress:
+    """Handed to a job runner so it can report task progress and stop when cancelled"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.task_names = []
+        self.completed = 0
+
+    def start(self, task_names):
+        """Record the tasks the job will run, in order"""
+        self.task_names = list(task_names)
+        self.completed = 0
+        self.store.update(
+            self.job_id,
+            total_tasks=len(self.task_names),
+            tasks_completed=0,
+            current_task=self.task_names[0] if self.task_names else None
+        )
+        self.check_cancelled()
+
+    def task_done(self, output=None):
+        """Crew task callback: advance to the next task, or stop the crew if cancelled"""
+        self.completed += 1
+        upcoming = self.task_names[self.completed] if self.completed < len(self.task_names) else None
+        self.store.update(self.job_id, tasks_completed=self.completed, current_task=upcoming)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.store.cancel_requested(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+class JobManager:
+    """Runs registered job kinds on a bounded worker pool, tracking them in a JobStore.
+
+    A runner is called as `runner(params, progress)` in a worker thread and
+    returns a JSON-serializable result. Passing `progress.task_done` as the
+    crew's task callback lets cancellation stop the crew between tasks.
+    """
+
+    def __init__(self, store, max_workers=2):
+        self.store = store
+        self.max_workers = max_workers
+        self._runners = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew-job")
+
+    def register(self, kind, runner):
+        """Register a runner and resume this kind's jobs left over from a previous process"""
+        recovered = kind in self._runners
+        self._runners[kind] = runner
+        if recovered:
+            return
+        for job in self.store.unfinished(kind):
+            if job["status"] == RUNNING:
+                # Sibling workers sharing the table keep their own running jobs
+                if job["worker_pid"] != os.getpid() and _process_alive(job["worker_pid"]):
+                    continue
+                # Its crew died with the old process; the partial run can't be resumed
+                self.store.update(job["id"], status=FAILED, current_task=None,
+                                  error="Interrupted by a server restart")
+            else:
+                self._executor.submit(self._run, job["id"])
+
+    def submit(self, kind, params):
+        if kind not in self._runners:
+            raise KeyError(f"Unknown job kind: {kind}")
+        job_id = self.store.create(kind, params)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        """Request cancellation; returns the job's state afterwards, or None if unknown"""
+        self.store.request_cancel(job_id)
+        return self.store.get(job_id)
+
+    def _run(self, job_id):
+        if not self.store.claim(job_id):
+            return
+        job = self.store.get(job_id)
+        progress = JobProgress(self.store, job_id)
+        try:
+            result = self._runners[job["kind"]](job["params"], progress)
+            self.store.update(job_id, status=SUCCEEDED, current_task=None, result=result)
+        except JobCancelled:
+            self.store.update(job_id, status=CANCELLED, current_task=None)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, current_task=None, error=str(e))
+
+
+def public_job(job):
+    """The job fields exposed to API clients"""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "current_task": job["current_task"],
+        "tasks_completed": job["tasks_completed"],
+        "total_tasks": job["total_tasks"],
+        "cancel_requested": job["cancel_requested"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+
+def create_job_router(kinds, manager=None):
+    """Status, result and cancel endpoints shared by the services that run jobs.
+
+    Only jobs of the given `kinds` are visible, so services sharing one job
+    table (as under the gateway) don't serve each other's jobs. Without a
+    `manager` the process-wide one is used, created on first request.
+    """
+    kinds = (kinds,) if isinstance(kinds, str) else tuple(kinds)
+    router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+    def current():
+        return manager or get_job_manager()
+
+    def load(job_id):
+        job = current().store.get(job_id)
+        if job is None or job["kind"] not in kinds:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return job
+
+    @router.get("/{job_id}")
+    async def job_status(job_id: str):
+        """Poll a job's status and the task it is currently running"""
+        return public_job(load(job_id))
+
+    @router.get("/{job_id}/result")
+    async def job_result(job_id: str):
+        """Fetch the result of a finished job"""
+        job = load(job_id)
+        if job["status"] == SUCCEEDED:
+            return job["result"]
+        if job["status"] in (QUEUED, RUNNING):
+            raise HTTPException(status_code=409, detail=public_job(job))
+        raise HTTPException(status_code=410, detail=public_job(job))
+
+    @router.post("/{job_id}/cancel")
+    async def cancel_job(job_id: str):
+        """Cancel a queued job, or stop a running one after its current task"""
+        load(job_id)
+        return public_job(current().cancel(job_id))
+
+    return router
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Process-wide job manager configured from JOBS_DB and JOB_WORKERS"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                JobStore(os.getenv("JOBS_DB", "jobs.db")),
+                max_workers=int(os.getenv("JOB_WORKERS", "2"))
+            )
+        return _manager
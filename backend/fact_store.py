@@ -0,0 +1,228 @@
+import re
+from collections import OrderedDict
+from datetime import datetime
+
+
+# Slots that hold a single current value; a new fact supersedes the old one
+SINGLE_SLOTS = ("name", "location", "age", "occupation", "education", "language")
+
+# Slots that hold several values, capped so the facts block stays bounded
+MULTI_SLOT_LIMITS = {
+    "preferences": 10,
+    "dislikes": 10,
+    "other": 15,
+}
+
+SLOT_ORDER = SINGLE_SLOTS + tuple(MULTI_SLOT_LIMITS)
+
+# Captured value runs until punctuation or a conjunction starting a new clause
+_VALUE = r"([^,.;!?]+?)(?=\s+(?:and|but|because|so)\b|[,.;!?]|$)"
+
+# Patterns only fire when the user is the subject ("I ...", "User ...", "My ...", "User's ..."),
+# so facts about other things ("User's favourite book is called Dune") don't land in the user's slots
+_USER = r"(?:\bthe user|\buser|\bi)(?:\s+(?:really|also|actually|still|now|currently))?"
+_USER_IS = r"(?:\bthe user is|\buser is|\bi am|\bi'm)"
+_USERS = r"(?:\bthe user's|\buser's|\bmy)"
+
+# (slot, pattern) pairs; the first match wins, so negative preferences come first
+SLOT_PATTERNS = [
+    ("name", re.compile(
+        rf"(?:{_USERS}\s+(?:full\s+)?name is|{_USER_IS}\s+called|{_USER}\s+goes? by)\s+" + _VALUE, re.I)),
+    ("age", re.compile(rf"{_USER_IS}\s+(\d{{1,3}})\s*(?:years?|yrs?)\s*old\b", re.I)),
+    ("age", re.compile(rf"{_USERS}\s+age is\s+(\d{{1,3}})\b", re.I)),
+    ("location", re.compile(
+        rf"(?:{_USER}\s+(?:live[sd]? in|comes? from)|{_USER_IS}\s+(?:living in|based in|located in|from))\s+"
+        + _VALUE, re.I)),
+    ("occupation", re.compile(
+        rf"(?:{_USER}\s+works? as(?: an?)?|{_USER_IS}\s+working as(?: an?)?|{_USERS}\s+(?:job|occupation|profession) is)\s+"
+        + _VALUE, re.I)),
+    ("education", re.compile(
+        rf"(?:{_USER}\s+stud(?:y|ies)|{_USER_IS}\s+(?:studying|majoring in|enrolled in|in (?:grade|class)))\s+"
+        + _VALUE, re.I)),
+    ("language", re.compile(
+        rf"(?:{_USER}\s+(?:prefers? to speak|speaks?)|{_USERS}\s+native language is)\s+" + _VALUE, re.I)),
+    ("dislikes", re.compile(
+        rf"{_USER}\s+(?:dislikes?|hates?|doesn't like|does not like|don't like|do not like)\s+" + _VALUE, re.I)),
+    ("preferences", re.compile(
+        rf"(?:{_USER}\s+(?:likes?|loves?|enjoys?|prefers?)|{_USER_IS}\s+(?:interested in|a fan of))\s+"
+        + _VALUE, re.I)),
+]
+
+_ARTICLES = {"a", "an", "the", "to", "my", "his", "her", "their"}
+
+
+def _tokens(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in _ARTICLES]
+
+
+def _similarity(a, b):
+    """Jaccard similarity of the word sets of two strings"""
+    a, b = set(_tokens(a)), set(_tokens(b))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def classify_fact(content):
+    """Return (slot, key, value) for a fact; key identifies the entry inside the slot"""
+    for slot, pattern in SLOT_PATTERNS:
+        match = pattern.search(content)
+        if match:
+            value = " ".join(_tokens(match.group(1)))
+            if value:
+                return slot, (slot if slot in SINGLE_SLOTS else value), value
+    value = " ".join(_tokens(content))
+    return "other", value, value
+
+
+# Clause boundaries: punctuation, or a conjunction starting a new clause
+_CLAUSE_BREAK = re.compile(r"[,.;!?]|\s+(?:and|but|because|so|while|though)\s+", re.I)
+
+
+def _first_slot(text, slots):
+    """First (slot, match) among `slots`; pattern order keeps "I don't like X" from reading as a like"""
+    for slot, pattern in SLOT_PATTERNS:
+        if slot in slots:
+            match = pattern.search(text)
+            if match:
+                return slot, match
+    return None, None
+
+
+def heuristic_facts(message):
+    """Extract short, slot-shaped facts from a raw message without calling a model.
+
+    Every clause is scanned, and a clause that drops its subject ("... but
+    prefer Y") is read as the user speaking.
+
+    >>> heuristic_facts("I dislike spinach but prefer broccoli")
+    ['User dislikes spinach', 'User likes broccoli']
+    >>> heuristic_facts("My name is Asha, I live in Pune and I love chess")
+    ["User's name is Asha", 'User lives in Pune', 'User likes chess']
+    >>> heuristic_facts("I don't like exams")
+    ['User dislikes exams']
+    """
+    facts = []
+    templates = {
+        "name": "User's name is {}",
+        "age": "User is {} years old",
+        "location": "User lives in {}",
+        "occupation": "User works as {}",
+        "education": "User studies {}",
+        "dislikes": "User dislikes {}",
+        "preferences": "User likes {}",
+    }
+    filled = set()
+    for clause in _CLAUSE_BREAK.split(message):
+        clause = clause.strip()
+        if not clause:
+            continue
+        slot, found = _first_slot(clause, templates)
+        if found is None:
+            slot, found = _first_slot("I " + clause, templates)
+        if found is None:
+            continue
+        # Single-value slots keep their first value; likes and dislikes collect every one
+        if slot in SINGLE_SLOTS and slot in filled:
+            continue
+        filled.add(slot)
+        fact = templates[slot].format(found.group(1).strip())
+        if fact not in facts:
+            facts.append(fact)
+    return facts
+
+
+class FactStore:
+    """Slot-keyed store of user facts with near-duplicate detection and supersession.
+
+    Facts are indexed by slot and by a normalized key inside the slot, so
+    lookups are O(1) and re-stating a fact replaces it instead of growing
+    the list.
+    """
+
+    def __init__(self, similarity_threshold=0.8):
+        self.similarity_threshold = similarity_threshold
+        self._slots = {slot: OrderedDict() for slot in SLOT_ORDER}
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        """Build a store from persisted fact records (old plain records are re-slotted)"""
+        store = cls(**kwargs)
+        for record in records or []:
+            store.add(record["content"], timestamp=record.get("timestamp"))
+        return store
+
+    def add(self, content, timestamp=None):
+        """Add a fact; returns False if it was a duplicate of what is already stored"""
+        content = (content or "").strip()
+        if not content:
+            return False
+
+        slot, key, value = classify_fact(content)
+        entries = self._slots[slot]
+        fact = {
+            "content": content,
+            "slot": slot,
+            "key": key,
+            "value": value,
+            "timestamp": timestamp or datetime.now().isoformat()
+        }
+
+        existing = entries.get(key)
+        if existing is None and slot not in SINGLE_SLOTS:
+            existing_key = self._find_near_duplicate(entries, content)
+            if existing_key is not None:
+                key = fact["key"] = existing_key
+                existing = entries[existing_key]
+
+        # Single-value slots compare values, so "lives in Pune" -> "lives in Puri" is a change;
+        # in multi-value slots the whole sentence is what identifies the entry
+        if slot in SINGLE_SLOTS:
+            same = existing is not None and _similarity(existing.get("value", ""), value) >= self.similarity_threshold
+        else:
+            same = existing is not None and _similarity(existing["content"], content) >= self.similarity_threshold
+        if existing is not None and (existing.get("value") == value or same):
+            # Same fact re-stated: keep it but mark it as fresh
+            existing["timestamp"] = fact["timestamp"]
+            entries.move_to_end(key)
+            return False
+
+        # Liking something supersedes disliking it and vice versa
+        opposite = {"preferences": "dislikes", "dislikes": "preferences"}.get(slot)
+        if opposite:
+            self._slots[opposite].pop(key, None)
+
+        entries[key] = fact
+        entries.move_to_end(key)
+
+        limit = MULTI_SLOT_LIMITS.get(slot)
+        while limit and len(entries) > limit:
+            entries.popitem(last=False)
+        return True
+
+    def _find_near_duplicate(self, entries, content):
+        for key, fact in entries.items():
+            if _similarity(fact["content"], content) >= self.similarity_threshold:
+                return key
+        return None
+
+    def get(self, slot):
+        """Get the facts stored in one slot"""
+        return list(self._slots.get(slot, {}).values())
+
+    def remove(self, slot, key=None):
+        """Forget a whole slot or a single value inside it"""
+        entries = self._slots.get(slot)
+        if entries is None:
+            return
+        if key is None or slot in SINGLE_SLOTS:
+            entries.clear()
+        else:
+            entries.pop(key, None)
+
+    def records(self):
+        """All current facts in slot order, ready to be persisted"""
+        return [fact for slot in SLOT_ORDER for fact in self._slots[slot].values()]
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._slots.values())
@@ -0,0 +1,328 @@
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TASK_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+TRACE_HEADER = "X-Trace-Id"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labels, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-1]:.6f}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal in-process metrics registry rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "vidya_http_request_seconds", "Wall time of HTTP requests",
+    ("service", "method", "route", "status"))
+LLM_CALL_SECONDS = registry.histogram(
+    "vidya_llm_call_seconds", "Provider latency of individual model calls, including CrewAI agent calls",
+    ("service", "stage", "model"))
+LLM_TOKENS = registry.counter(
+    "vidya_llm_tokens_total", "Prompt and completion tokens used by model calls",
+    ("service", "stage", "model", "type"))
+GENERATE_SECONDS = registry.histogram(
+    "vidya_generate_seconds", "Wall time of direct GeminiLLM calls, including queueing and retries",
+    ("service", "stage", "model", "outcome"))
+CACHE_LOOKUPS = registry.counter(
+    "vidya_llm_cache_lookups_total", "Prompt cache lookups by result",
+    ("service", "result"))
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "vidya_llm_queue_wait_seconds", "Time model calls waited for a rate-limit slot",
+    ("service", "model", "priority"))
+CREW_TASK_SECONDS = registry.histogram(
+    "vidya_crew_task_seconds", "Wall time of each CrewAI agent task",
+    ("service", "task"), buckets=TASK_BUCKETS)
+
+
+class Trace:
+    """Per-request labels shared by everything the request runs, including worker threads"""
+
+    def __init__(self, trace_id=None, service=None, stage="generate"):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.service = service
+        self.stage = stage
+
+
+_trace = contextvars.ContextVar("trace", default=None)
+_default_service = "unknown"
+
+
+def current_trace(create=False):
+    trace = _trace.get()
+    if trace is None and create:
+        trace = Trace(service=_default_service)
+        _trace.set(trace)
+    return trace
+
+
+def _labels():
+    trace = _trace.get()
+    if trace is None:
+        return _default_service, "generate"
+    return trace.service or _default_service, trace.stage
+
+
+def record_llm_call(model, seconds, prompt_tokens=None, completion_tokens=None, service=None, stage=None):
+    """Record one provider call; labels default to the current trace"""
+    trace_service, trace_stage = _labels()
+    service, stage = service or trace_service, stage or trace_stage
+    LLM_CALL_SECONDS.observe(seconds, service=service, stage=stage, model=model)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, service=service, stage=stage, model=model, type="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, service=service, stage=stage, model=model, type="completion")
+
+
+def record_generate(model, seconds, outcome="ok"):
+    service, stage = _labels()
+    GENERATE_SECONDS.observe(seconds, service=service, stage=stage, model=model, outcome=outcome)
+
+
+def record_cache_lookup(hit):
+    service, _ = _labels()
+    CACHE_LOOKUPS.inc(service=service, result="hit" if hit else "miss")
+
+
+def record_queue_wait(model, seconds, priority):
+    service, _ = _labels()
+    QUEUE_WAIT_SECONDS.observe(seconds, service=service, model=model, priority=priority)
+
+
+class CrewTaskTimer:
+    """Crew task callback that times each sequential task and labels its model calls.
+
+    Wraps an optional inner callback (e.g. job progress), which still runs
+    after the task's time has been recorded.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.task_names = []
+        self.completed = 0
+        self.started = None
+        self.trace = None
+
+    def start(self, task_names):
+        self.task_names = list(task_names)
+        self.completed = 0
+        self.started = time.perf_counter()
+        self.trace = current_trace(create=True)
+        self.trace.stage = self.task_names[0] if self.task_names else "generate"
+
+    def task_done(self, output=None):
+        now = time.perf_counter()
+        if self.started is not None and self.completed < len(self.task_names):
+            service = self.trace.service or _default_service
+            CREW_TASK_SECONDS.observe(now - self.started, service=service,
+                                      task=self.task_names[self.completed])
+        self.completed += 1
+        self.started = now
+        if self.trace is not None:
+            self.trace.stage = (self.task_names[self.completed]
+                                if self.completed < len(self.task_names) else "generate")
+        if self.callback is not None:
+            self.callback(output)
+
+
+_hook_installed = False
+_hook_lock = threading.Lock()
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def install_metrics_hook():
+    """Record latency and tokens for every litellm call, including CrewAI agents' calls"""
+    global _hook_installed
+    if _hook_installed:
+        return
+    with _hook_lock:
+        if _hook_installed:
+            return
+        try:
+            import litellm
+            from litellm.integrations.custom_logger import CustomLogger
+        except ImportError:
+            return
+
+        class _MetricsHook(CustomLogger):
+            def __init__(self):
+                super().__init__()
+                # litellm may report success from another thread, so capture the
+                # caller's labels before the call, keyed by litellm's call id
+                self._pending = OrderedDict()
+                self._lock = threading.Lock()
+
+            def log_pre_api_call(self, model, messages, kwargs):
+                call_id = kwargs.get("litellm_call_id")
+                if call_id is None:
+                    return
+                with self._lock:
+                    self._pending[call_id] = _labels()
+                    while len(self._pending) > 10000:
+                        self._pending.popitem(last=False)
+
+            def _record(self, kwargs, response_obj, start_time, end_time):
+                with self._lock:
+                    labels = self._pending.pop(kwargs.get("litellm_call_id"), None)
+                # Only record once per call, even if both sync and async handlers fire
+                if labels is None:
+                    return
+                seconds = (end_time - start_time).total_seconds() if start_time and end_time else 0.0
+                prompt_tokens, completion_tokens = _usage_tokens(response_obj)
+                record_llm_call(kwargs.get("model") or "unknown", seconds, prompt_tokens,
+                                completion_tokens, service=labels[0], stage=labels[1])
+
+            def log_success_event(self, kwargs, response_obj, start_time, end_time):
+                self._record(kwargs, response_obj, start_time, end_time)
+
+            async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+                self._record(kwargs, response_obj, start_time, end_time)
+
+            def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+                with self._lock:
+                    self._pending.pop(kwargs.get("litellm_call_id"), None)
+
+            async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+                self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+        litellm.callbacks.append(_MetricsHook())
+        _hook_installed = True
+
+
+def instrument_app(app, service):
+    """Add a `/metrics` endpoint and per-request trace IDs to a FastAPI app.
+
+    The trace ID is taken from an incoming `X-Trace-Id` header or generated,
+    and echoed back on the response.
+    """
+    from fastapi.responses import PlainTextResponse
+
+    global _default_service
+    if _default_service == "unknown":
+        _default_service = service
+
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        trace = Trace(request.headers.get(TRACE_HEADER), service)
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers[TRACE_HEADER] = trace.trace_id
+            return response
+        finally:
+            _trace.reset(token)
+            route = request.scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, service=service, method=request.method,
+                route=getattr(route, "path", "unmatched"), status=status
+            )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    return app
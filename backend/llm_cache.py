@@ -0,0 +1,157 @@
+import os
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def _digest(payload):
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def litellm_embedder(model="gemini/text-embedding-004"):
+    """Build an embedding function backed by litellm for semantic lookups"""
+    def embed(text):
+        import litellm
+        response = litellm.embedding(model=model, input=[text])
+        return response.data[0]["embedding"]
+    return embed
+
+
+class PromptCache:
+    """LRU + TTL cache of model responses keyed on model, messages and parameters.
+
+    Exact lookups hash the whole request. Semantic lookups (when an embedder
+    is configured) only compare requests whose model, parameters and every
+    message except the last are identical, and match the last message by
+    embedding similarity.
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600.0, embedder=None, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _keys(self, model, messages, params):
+        params = {k: v for k, v in params.items() if v is not None}
+        key = _digest({"model": model, "messages": messages, "params": params})
+        prefix = _digest({"model": model, "messages": messages[:-1], "params": params})
+        return key, prefix
+
+    def _alive(self, key, entry, now):
+        if entry["expires"] is not None and entry["expires"] < now:
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return False
+        return True
+
+    def get(self, model, messages, params=None, semantic=False):
+        """Return a cached response or None"""
+        key, prefix = self._keys(model, messages, params or {})
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._alive(key, entry, now):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry["response"]
+
+        if semantic and self.embedder is not None and messages:
+            vector = self._embed(messages[-1]["content"])
+            if vector is not None:
+                with self._lock:
+                    best_key, best_score = None, self.similarity_threshold
+                    for other_key, other in list(self._entries.items()):
+                        if other["prefix"] != prefix or other["vector"] is None:
+                            continue
+                        if not self._alive(other_key, other, now):
+                            continue
+                        score = _cosine(vector, other["vector"])
+                        if score >= best_score:
+                            best_key, best_score = other_key, score
+                    if best_key is not None:
+                        self._entries.move_to_end(best_key)
+                        self._stats["semantic_hits"] += 1
+                        return self._entries[best_key]["response"]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, model, messages, response, params=None, ttl=None, semantic=False):
+        """Store a response, evicting the least recently used entries past `max_entries`"""
+        key, prefix = self._keys(model, messages, params or {})
+        vector = None
+        if semantic and self.embedder is not None and messages:
+            vector = self._embed(messages[-1]["content"])
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = {
+                "response": response,
+                "prefix": prefix,
+                "vector": vector,
+                "expires": time.monotonic() + ttl if ttl else None
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _embed(self, text):
+        try:
+            return self.embedder(text)
+        except Exception as e:
+            print(f"Error embedding prompt for cache lookup: {str(e)}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["semantic_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide prompt cache, configured from the environment on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                embedding_model = os.getenv("LLM_CACHE_EMBEDDING_MODEL")
+                _cache = PromptCache(
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+                    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+                    embedder=litellm_embedder(embedding_model) if embedding_model else None,
+                    similarity_threshold=float(os.getenv("LLM_CACHE_SIMILARITY", "0.95"))
+                )
+    return _cache
+
+
+def set_cache(cache):
+    """Replace the process-wide prompt cache"""
+    global _cache
+    _cache = cache
@@ -0,0 +1,364 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from llm_cache import get_cache
+from llm_scheduler import get_scheduler, admitted
+from context_budget import estimate_tokens
+from instrumentation import install_metrics_hook, record_cache_lookup, record_generate, record_llm_call
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini/gemini-2.0-flash-lite"
+
+# HTTP status codes worth retrying: timeouts, rate limits and provider hiccups
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# litellm / httpx exception names that signal a transient failure
+TRANSIENT_ERROR_NAMES = {
+    "Timeout",
+    "TimeoutException",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "APIConnectionError",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "InternalServerError",
+    "ConnectError",
+    "RemoteProtocolError",
+}
+
+
+def _is_transient(error):
+    """Whether an exception from a provider call is worth retrying"""
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    if getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES:
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+class LiteLLMProvider:
+    """Calls models through litellm using shared keep-alive HTTP connection pools"""
+
+    def __init__(self, max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._litellm = None
+        self._lock = threading.Lock()
+
+    def _get_litellm(self):
+        if self._litellm is None:
+            with self._lock:
+                if self._litellm is None:
+                    import httpx
+                    import litellm
+
+                    limits = httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry
+                    )
+                    # litellm reuses these clients for every call instead of opening new connections
+                    litellm.client_session = httpx.Client(limits=limits)
+                    litellm.aclient_session = httpx.AsyncClient(limits=limits)
+                    install_metrics_hook()
+                    self._litellm = litellm
+        return self._litellm
+
+    def complete(self, model, messages, timeout=None, **params):
+        response = self._get_litellm().completion(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            **params
+        )
+        return response.choices[0].message.content
+
+    async def acomplete(self, model, messages, timeout=None, **params):
+        response = await self._get_litellm().acompletion(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            **params
+        )
+        return response.choices[0].message.content
+
+    async def astream(self, model, messages, timeout=None, **params):
+        response = await self._get_litellm().acompletion(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            stream=True,
+            **params
+        )
+        async for part in response:
+            delta = part.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class MockProvider:
+    """Deterministic local provider for offline testing and benchmarks.
+
+    Replies are derived from a hash of the prompt, so identical prompts get
+    identical answers. `responder` can be set to a callable
+    `(model, messages) -> str` to script specific replies.
+    """
+
+    def __init__(self, latency=0.0, output_chars=200, responder=None):
+        self.latency = latency
+        self.output_chars = output_chars
+        self.responder = responder
+        self.calls = 0
+
+    def _reply(self, model, messages):
+        self.calls += 1
+        if self.responder is not None:
+            text = self.responder(model, messages)
+        else:
+            prompt = messages[-1]["content"] if messages else ""
+            digest = hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+            text = f"Mock response {digest[:12]} to: {prompt[:80]}"
+            if len(text) < self.output_chars:
+                filler = " lorem ipsum"
+                text += filler * ((self.output_chars - len(text)) // len(filler) + 1)
+            text = text[:max(self.output_chars, 1)]
+        # Estimated usage, so metrics look like a real provider's in offline runs
+        record_llm_call(model, self.latency,
+                        sum(estimate_tokens(m.get("content")) for m in messages),
+                        estimate_tokens(text))
+        return text
+
+    def complete(self, model, messages, timeout=None, **params):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(model, messages)
+
+    async def acomplete(self, model, messages, timeout=None, **params):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(model, messages)
+
+    async def astream(self, model, messages, timeout=None, stream_chunks=8, **params):
+        text = self._reply(model, messages)
+        size = max(1, len(text) // stream_chunks + 1)
+        for start in range(0, len(text), size):
+            if self.latency:
+                await asyncio.sleep(self.latency / stream_chunks)
+            yield text[start:start + size]
+
+
+class LLMClient:
+    """Shared model client with per-call timeouts, jittered retries and a concurrency limit.
+
+    Every attempt first waits for a slot from the process-wide LLMScheduler,
+    so rate limits are respected and interactive calls jump the queue.
+    """
+
+    def __init__(self, provider=None, timeout=60.0, max_retries=3, backoff_base=0.5,
+                 backoff_max=8.0, max_concurrency=16, scheduler=None, cache=None):
+        self.provider = provider or LiteLLMProvider()
+        self._scheduler = scheduler
+        self._cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        # One limiter for sync and async calls, so max_concurrency caps the process as a whole
+        self._limiter = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def scheduler(self):
+        return self._scheduler or get_scheduler()
+
+    @property
+    def cache(self):
+        return self._cache or get_cache()
+
+    def _cache_lookup(self, model, messages, cache, params):
+        if not cache:
+            return None
+        cached = self.cache.get(model, messages, params, semantic=(cache == "semantic"))
+        record_cache_lookup(cached is not None)
+        return cached
+
+    def _cache_store(self, model, messages, response, cache, cache_ttl, params):
+        if cache and response:
+            self.cache.put(model, messages, response, params, ttl=cache_ttl,
+                           semantic=(cache == "semantic"))
+
+    def _backoff(self, attempt):
+        # "Full jitter": a random delay up to the exponential cap spreads retries out
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @asynccontextmanager
+    async def _async_slot(self):
+        """Hold a slot of the shared limiter without blocking the event loop while waiting"""
+        if not self._limiter.acquire(blocking=False):
+            waiter = asyncio.ensure_future(asyncio.to_thread(self._limiter.acquire))
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                # The thread still gets the slot; hand it back as soon as it does
+                waiter.add_done_callback(lambda _: self._limiter.release())
+                raise
+        try:
+            yield
+        finally:
+            self._limiter.release()
+
+    def complete(self, model, messages, timeout=None, cache=False, cache_ttl=None, **params):
+        """Blocking completion, safe to call from worker threads and CrewAI tools.
+
+        `cache` opts the call site into the prompt cache: True for exact-match
+        lookups, "semantic" to also match similar prompts.
+        """
+        cached = self._cache_lookup(model, messages, cache, params)
+        if cached is not None:
+            return cached
+        timeout = timeout or self.timeout
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            self.scheduler.acquire(model)
+            try:
+                with self._limiter, admitted():
+                    response = self.provider.complete(model, messages, timeout=timeout, **params)
+                self._cache_store(model, messages, response, cache, cache_ttl, params)
+                record_generate(model, time.perf_counter() - started)
+                return response
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_transient(e):
+                    record_generate(model, time.perf_counter() - started, outcome="error")
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("Transient LLM error (%s), retrying in %.2fs", type(e).__name__, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    async def acomplete(self, model, messages, timeout=None, cache=False, cache_ttl=None, **params):
+        """Native async completion that never blocks the event loop"""
+        cached = self._cache_lookup(model, messages, cache, params)
+        if cached is not None:
+            return cached
+        timeout = timeout or self.timeout
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            await self.scheduler.acquire_async(model)
+            try:
+                async with self._async_slot():
+                    with admitted():
+                        response = await asyncio.wait_for(
+                            self.provider.acomplete(model, messages, timeout=timeout, **params),
+                            timeout
+                        )
+                self._cache_store(model, messages, response, cache, cache_ttl, params)
+                record_generate(model, time.perf_counter() - started)
+                return response
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_transient(e):
+                    record_generate(model, time.perf_counter() - started, outcome="error")
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("Transient LLM error (%s), retrying in %.2fs", type(e).__name__, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def astream(self, model, messages, timeout=None, **params):
+        """Stream a completion as text deltas; retries only happen before the first delta"""
+        timeout = timeout or self.timeout
+        attempt = 0
+        began = time.perf_counter()
+        while True:
+            await self.scheduler.acquire_async(model)
+            started = False
+            try:
+                async with self._async_slot():
+                    with admitted():
+                        async for delta in self.provider.astream(model, messages, timeout=timeout, **params):
+                            started = True
+                            yield delta
+                record_generate(model, time.perf_counter() - began)
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not _is_transient(e):
+                    record_generate(model, time.perf_counter() - began, outcome="error")
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("Transient LLM error (%s), retrying in %.2fs", type(e).__name__, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+def _provider_from_env():
+    if os.getenv("LLM_PROVIDER", "litellm").lower() == "mock":
+        return MockProvider(
+            latency=float(os.getenv("MOCK_LLM_LATENCY", "0")),
+            output_chars=int(os.getenv("MOCK_LLM_OUTPUT_CHARS", "200"))
+        )
+    return LiteLLMProvider(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "50")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide LLM client, creating it from the environment on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    provider=_provider_from_env(),
+                    timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+                    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+                )
+    return _client
+
+
+def set_client(client):
+    """Replace the process-wide client, e.g. with one backed by MockProvider"""
+    global _client
+    _client = client
+
+
+class GeminiLLM:
+    """Wrapper for the Gemini model integration with CrewAI, backed by the shared client"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, client=None):
+        self.model_name = model_name
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    def generate(self, messages, timeout=None, cache=False, cache_ttl=None, **params):
+        return self.client.complete(self.model_name, messages, timeout=timeout,
+                                    cache=cache, cache_ttl=cache_ttl, **params)
+
+    async def agenerate(self, messages, timeout=None, cache=False, cache_ttl=None, **params):
+        return await self.client.acomplete(self.model_name, messages, timeout=timeout,
+                                           cache=cache, cache_ttl=cache_ttl, **params)
+
+    async def astream(self, messages, timeout=None, **params):
+        async for delta in self.client.astream(self.model_name, messages, timeout=timeout, **params):
+            yield delta
+
+    def chat(self, messages):
+        return self.generate(messages)
@@ -0,0 +1,378 @@
+import os
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from instrumentation import install_metrics_hook, record_queue_wait
+
+
+# Priority classes, lower runs first
+INTERACTIVE = 0
+NORMAL = 1
+BATCH = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+
+_priority = contextvars.ContextVar("llm_priority", default=NORMAL)
+_user = contextvars.ContextVar("llm_user", default="anonymous")
+_admitted = contextvars.ContextVar("llm_admitted", default=False)
+# Timeouts the litellm hook hit inside a `surface_timeouts` block
+_hook_timeouts = contextvars.ContextVar("llm_hook_timeouts", default=None)
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a call waited longer than `max_wait` for a rate-limit slot"""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        """Response headers telling the client when to try again"""
+        return {"Retry-After": str(math.ceil(self.retry_after))}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        if not self.rate:
+            return True
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now):
+        """Seconds until the next token becomes available"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class _Ticket:
+    __slots__ = ("bucket", "priority", "user", "enqueued", "event", "future", "loop", "granted")
+
+    def __init__(self, bucket, priority, user, loop=None):
+        self.bucket = bucket
+        self.priority = priority
+        self.user = user
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+
+
+class LLMScheduler:
+    """Process-wide gate in front of outbound model calls.
+
+    Each model gets its own token bucket. Waiting calls are served strictly by
+    priority class, and round-robin across users inside a class, so one
+    user's burst of batch jobs cannot starve everybody else.
+    """
+
+    def __init__(self, default_rpm=30, default_burst=5, max_wait=120.0):
+        self.default_rpm = default_rpm
+        self.default_burst = default_burst
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._limits = {}
+        # priority -> OrderedDict(user -> deque of tickets)
+        self._queues = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._stats = {
+            "granted": {name: 0 for name in PRIORITY_NAMES.values()},
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def configure(self, model, rpm, burst=None):
+        """Override the rate limit for one model (rpm=0 disables limiting)"""
+        with self._cond:
+            self._limits[model] = (rpm, burst or self.default_burst)
+            self._buckets.pop(model, None)
+
+    def _bucket(self, model):
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            rpm, burst = self._limits.get(model, (self.default_rpm, self.default_burst))
+            bucket = self._buckets[model] = TokenBucket(rpm / 60.0, burst)
+        return bucket
+
+    def _enqueue(self, ticket):
+        """Queue a ticket; returns True if it could be granted straight away"""
+        with self._cond:
+            # Fast path: nobody is waiting and a token is available
+            if not any(self._queues.values()) and self._bucket(ticket.bucket).try_take(time.monotonic()):
+                ticket.granted = True
+                self._stats["granted"][PRIORITY_NAMES[ticket.priority]] += 1
+                return True
+            users = self._queues[ticket.priority]
+            users.setdefault(ticket.user, deque()).append(ticket)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+            return False
+
+    def _discard(self, ticket):
+        """Drop a ticket that gave up waiting; returns True if it had been granted meanwhile"""
+        with self._cond:
+            if ticket.granted:
+                return True
+            users = self._queues[ticket.priority]
+            tickets = users.get(ticket.user)
+            if tickets is not None:
+                try:
+                    tickets.remove(ticket)
+                except ValueError:
+                    pass
+                if not tickets:
+                    del users[ticket.user]
+            self._stats["timeouts"] += 1
+            return False
+
+    def _grant_ready(self, now):
+        """Grant every ticket that can run now; returns seconds until the next token"""
+        next_wake = None
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            progressed = True
+            while progressed and users:
+                progressed = False
+                for user in list(users):
+                    ticket = users[user][0]
+                    bucket = self._bucket(ticket.bucket)
+                    if not bucket.try_take(now):
+                        wait = bucket.wait_time(now)
+                        next_wake = wait if next_wake is None else min(next_wake, wait)
+                        continue
+                    users[user].popleft()
+                    if not users[user]:
+                        del users[user]
+                    else:
+                        # Round robin: this user goes to the back of its class
+                        users.move_to_end(user)
+                    self._grant(ticket, now)
+                    progressed = True
+                    break
+        return next_wake
+
+    def _grant(self, ticket, now):
+        ticket.granted = True
+        waited = now - ticket.enqueued
+        self._stats["granted"][PRIORITY_NAMES[ticket.priority]] += 1
+        self._stats["total_wait_seconds"] += waited
+        self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        if ticket.event is not None:
+            ticket.event.set()
+        else:
+            ticket.loop.call_soon_threadsafe(
+                lambda f=ticket.future: f.done() or f.set_result(None)
+            )
+
+    def _run(self):
+        with self._cond:
+            while True:
+                if not any(self._queues.values()):
+                    self._cond.wait()
+                    continue
+                next_wake = self._grant_ready(time.monotonic())
+                if any(self._queues.values()):
+                    self._cond.wait(timeout=next_wake if next_wake else 0.05)
+
+    def acquire(self, model, priority=None, user=None, max_wait=None):
+        """Block until `model` may be called; raises SchedulerTimeout after `max_wait`.
+
+        Only for worker threads: waiting here on the event loop would stall
+        every other request, so async code must use `acquire_async`.
+        """
+        if _on_event_loop():
+            raise RuntimeError("LLMScheduler.acquire blocks; use acquire_async on the event loop")
+        ticket = _Ticket(model, _priority.get() if priority is None else priority,
+                         user or _user.get())
+        if not self._enqueue(ticket):
+            max_wait = self.max_wait if max_wait is None else max_wait
+            if not ticket.event.wait(max_wait) and not self._discard(ticket):
+                raise SchedulerTimeout(
+                    f"Model {model} is busy, gave up after waiting {max_wait:.0f}s",
+                    retry_after=self._retry_after(model)
+                )
+        record_queue_wait(model, time.monotonic() - ticket.enqueued, PRIORITY_NAMES[ticket.priority])
+
+    async def acquire_async(self, model, priority=None, user=None, max_wait=None):
+        """Async variant of `acquire` that waits without holding a thread"""
+        ticket = _Ticket(model, _priority.get() if priority is None else priority,
+                         user or _user.get(), loop=asyncio.get_running_loop())
+        if not self._enqueue(ticket):
+            max_wait = self.max_wait if max_wait is None else max_wait
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), max_wait)
+            except asyncio.TimeoutError:
+                if not self._discard(ticket):
+                    raise SchedulerTimeout(
+                        f"Model {model} is busy, gave up after waiting {max_wait:.0f}s",
+                        retry_after=self._retry_after(model)
+                    )
+        record_queue_wait(model, time.monotonic() - ticket.enqueued, PRIORITY_NAMES[ticket.priority])
+
+    def _retry_after(self, model):
+        with self._cond:
+            depth = sum(len(t) for users in self._queues.values() for t in users.values())
+            bucket = self._bucket(model)
+            if not bucket.rate:
+                return 1.0
+            return max(1.0, depth / bucket.rate)
+
+    def queue_depths(self):
+        """Number of waiting calls per priority class"""
+        with self._cond:
+            return {
+                PRIORITY_NAMES[p]: sum(len(t) for t in users.values())
+                for p, users in self._queues.items()
+            }
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                "granted": dict(self._stats["granted"]),
+                "timeouts": self._stats["timeouts"],
+                "total_wait_seconds": round(self._stats["total_wait_seconds"], 3),
+                "max_wait_seconds": round(self._stats["max_wait_seconds"], 3),
+            }
+        stats["queue_depth"] = self.queue_depths()
+        return stats
+
+    def install_litellm_hook(self):
+        """Also gate calls CrewAI agents make straight through litellm"""
+        _install_litellm_hook(self)
+
+
+_hook_installed = False
+_hook_lock = threading.Lock()
+
+
+def _install_litellm_hook(scheduler):
+    global _hook_installed
+    if _hook_installed:
+        return
+    with _hook_lock:
+        if _hook_installed:
+            return
+        try:
+            import litellm
+            from litellm.integrations.custom_logger import CustomLogger
+        except ImportError:
+            # Offline/mock setups without litellm only have LLMClient calls to gate
+            return
+
+        class _SchedulerHook(CustomLogger):
+            def log_pre_api_call(self, model, messages, kwargs):
+                # Calls made through LLMClient already hold a slot; CrewAI calls
+                # run in worker threads, and a sync wait can't gate loop-side calls
+                if _admitted.get() or _on_event_loop():
+                    return
+                timeouts = _hook_timeouts.get()
+                if timeouts:
+                    # The block already gave up; don't queue every later call for another max_wait
+                    return
+                try:
+                    scheduler.acquire(kwargs.get("model") or model)
+                except SchedulerTimeout as e:
+                    # litellm logs and swallows callback errors, so keep it for the caller
+                    if timeouts is None:
+                        raise
+                    timeouts.append(e)
+
+        litellm.callbacks.append(_SchedulerHook())
+        _hook_installed = True
+
+
+@contextmanager
+def request_context(priority=NORMAL, user=None):
+    """Tag every model call made inside the block with a priority class and user"""
+    # litellm is only imported once the first model call is on its way
+    get_scheduler().install_litellm_hook()
+    install_metrics_hook()
+    priority_token = _priority.set(priority)
+    user_token = _user.set(user or "anonymous")
+    try:
+        yield
+    finally:
+        _priority.reset(priority_token)
+        _user.reset(user_token)
+
+
+@contextmanager
+def surface_timeouts():
+    """Re-raise a SchedulerTimeout the litellm hook hit inside the block.
+
+    Wrap CrewAI kickoffs in this: litellm swallows exceptions raised by its
+    callbacks, so without it a call that gave up waiting goes out unscheduled
+    and the caller never hears about it.
+    """
+    timeouts = []
+    token = _hook_timeouts.set(timeouts)
+    try:
+        yield
+    finally:
+        _hook_timeouts.reset(token)
+    if timeouts:
+        raise timeouts[0]
+
+
+@contextmanager
+def admitted():
+    """Mark calls inside the block as already scheduled"""
+    token = _admitted.set(True)
+    try:
+        yield
+    finally:
+        _admitted.reset(token)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, configured from the environment on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    default_rpm=float(os.getenv("LLM_RATE_LIMIT_RPM", "30")),
+                    default_burst=int(os.getenv("LLM_RATE_LIMIT_BURST", "5")),
+                    max_wait=float(os.getenv("LLM_QUEUE_MAX_WAIT", "120"))
+                )
+    return _scheduler
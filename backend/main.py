@@ -0,0 +1,98 @@
+import os
+import sys
+import importlib.util
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from instrumentation import TRACE_HEADER, registry
+
+
+# mount prefix -> (module name, file); each standalone service keeps its own port too
+SERVICES = {
+    "/chatbot": ("chatbot", "chatbot.py"),
+    "/code-generator": ("code_generator", "code_generator.py"),
+    "/resources": ("resource_generator", "resource_generator.py"),
+    "/study-aid": ("sos_exam_prep", "sos_exam_prep.py.py"),
+    "/canvas": ("canvas", "canvas.py"),
+}
+
+
+def load_service(module_name, filename):
+    """Import a service module by path (sos_exam_prep.py.py can't be imported by name)"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(BACKEND_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+service_apps = {
+    prefix: load_service(module_name, filename).app
+    for prefix, (module_name, filename) in SERVICES.items()
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mounted apps don't receive lifespan events, so run each service's startup here
+    async with AsyncExitStack() as stack:
+        for service_app in service_apps.values():
+            await stack.enter_async_context(service_app.router.lifespan_context(service_app))
+        yield
+
+
+app = FastAPI(
+    title="Vidya Mitra Gateway",
+    description="All Vidya Mitra services in one process, sharing LLM clients, caches and worker pools",
+    lifespan=lifespan
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=[TRACE_HEADER, "Retry-After"],
+)
+
+# Every service uses the process-wide LLM client, scheduler, prompt cache and
+# job manager, so mounting them here shares that warm state between them
+for prefix, service_app in service_apps.items():
+    app.mount(prefix, service_app)
+
+
+@app.get("/")
+async def root():
+    return {
+        "message": "Vidya Mitra gateway is running",
+        "services": {prefix: module_name for prefix, (module_name, _) in SERVICES.items()}
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # Multiple workers need the import string; each worker loads every service once
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("GATEWAY_HOST", "localhost"),
+        port=int(os.getenv("GATEWAY_PORT", "8080")),
+        workers=int(os.getenv("GATEWAY_WORKERS", "1"))
+    )
@@ -0,0 +1,191 @@
+def _fence_open(line):
+    """Return (fence_char, fence_len, info) if `line` opens a fence, else None"""
+    stripped = line.lstrip(" ")
+    if len(line) - len(stripped) > 3 or len(stripped) < 3:
+        return None
+    char = stripped[0]
+    if char not in "`~":
+        return None
+    length = len(stripped) - len(stripped.lstrip(char))
+    if length < 3:
+        return None
+    info = stripped[length:].strip()
+    # A backtick fence's info string may not contain backticks (that's inline code)
+    if char == "`" and "`" in info:
+        return None
+    return char, length, info
+
+
+def _fence_close(line, char, length):
+    stripped = line.strip()
+    return (len(line) - len(line.lstrip(" ")) <= 3 and len(stripped) >= length
+            and stripped == char * len(stripped))
+
+
+def _language(info):
+    return info.split()[0].lower() if info else None
+
+
+def _fence_lines(text):
+    """Yield (line_start, line_end, fence, rest) for each line that starts like a fence.
+
+    Candidates are located with str.find on the two fence markers, so the scan
+    runs at C speed and only fence-looking lines reach Python code.
+    """
+    size = len(text)
+    pos = 0
+    next_backticks = text.find("```")
+    next_tildes = text.find("~~~")
+    while next_backticks != -1 or next_tildes != -1:
+        if next_tildes == -1 or (next_backticks != -1 and next_backticks < next_tildes):
+            index, char = next_backticks, "`"
+        else:
+            index, char = next_tildes, "~"
+
+        line_start = text.rfind("\n", 0, index) + 1
+        line_end = text.find("\n", index)
+        if line_end == -1:
+            line_end = size
+        indent = text[line_start:index]
+        if len(indent) <= 3 and indent.strip(" ") == "":
+            run_end = index + 3
+            while run_end < line_end and text[run_end] == char:
+                run_end += 1
+            yield line_start, line_end, text[index:run_end], text[run_end:line_end]
+            pos = line_end + 1
+        else:
+            pos = index + 3
+
+        if next_backticks != -1 and next_backticks < pos:
+            next_backticks = text.find("```", pos)
+        if next_tildes != -1 and next_tildes < pos:
+            next_tildes = text.find("~~~", pos)
+
+
+def tokenize_fences(text):
+    """Find every fenced code block in `text` in one pass.
+
+    Returns a list of dicts with `language`, `code`, `start` and `end`, where
+    `text[start:end]` is the whole block including its fences. A block left
+    open at the end of the text runs to the end and has `closed` False.
+    """
+    blocks = []
+    size = len(text)
+    current = None  # (char, length, language, start, code_start)
+    for line_start, line_end, fence, rest in _fence_lines(text):
+        char, length = fence[0], len(fence)
+        if current is None:
+            info = rest.strip()
+            # A backtick fence's info string may not contain backticks (that's inline code)
+            if char == "`" and "`" in info:
+                continue
+            current = (char, length, _language(info), line_start, min(line_end + 1, size))
+        elif char == current[0] and length >= current[1] and not rest.strip():
+            char, length, language, start, code_start = current
+            blocks.append({
+                "language": language,
+                "code": text[code_start:line_start],
+                "start": start,
+                "end": line_end,
+                "closed": True
+            })
+            current = None
+
+    if current is not None:
+        char, length, language, start, code_start = current
+        blocks.append({
+            "language": language,
+            "code": text[code_start:],
+            "start": start,
+            "end": size,
+            "closed": False
+        })
+    return blocks
+
+
+def split_markdown(text):
+    """Tokenize `text` into code blocks plus the prose segments between them.
+
+    Returns `(blocks, prose)` where `prose` has one entry more than `blocks`:
+    the text before the first block, between each pair, and after the last.
+    """
+    blocks = tokenize_fences(text)
+    prose = []
+    cursor = 0
+    for block in blocks:
+        prose.append(text[cursor:block["start"]])
+        cursor = block["end"]
+    prose.append(text[cursor:])
+    return blocks, prose
+
+
+class FenceStream:
+    """Incremental variant of `tokenize_fences` for streamed output.
+
+    `feed()` returns the blocks completed by each delta, with offsets into
+    the concatenated stream, as soon as their closing fence arrives.
+    """
+
+    def __init__(self):
+        self._line = ""
+        self._offset = 0
+        self._current = None
+        self._code = None
+
+    def feed(self, chunk):
+        completed = []
+        self._line += chunk
+        while True:
+            newline = self._line.find("\n")
+            if newline == -1:
+                break
+            line, self._line = self._line[:newline], self._line[newline + 1:]
+            block = self._consume_line(line, newline + 1)
+            if block:
+                completed.append(block)
+        return completed
+
+    def close(self):
+        """Flush the trailing partial line and any block left open"""
+        completed = []
+        line, self._line = self._line, ""
+        if line:
+            block = self._consume_line(line, len(line))
+            if block:
+                completed.append(block)
+        if self._current is not None:
+            char, length, language, start = self._current
+            completed.append({
+                "language": language,
+                "code": "".join(self._code),
+                "start": start,
+                "end": self._offset,
+                "closed": False
+            })
+            self._current, self._code = None, None
+        return completed
+
+    def _consume_line(self, line, consumed):
+        start = self._offset
+        self._offset += consumed
+        stripped = line.rstrip("\r")
+        if self._current is None:
+            opened = _fence_open(stripped)
+            if opened:
+                char, length, info = opened
+                self._current = (char, length, _language(info), start)
+                self._code = []
+            return None
+        if _fence_close(stripped, self._current[0], self._current[1]):
+            char, length, language, block_start = self._current
+            block = {
+                "language": language,
+                "code": "".join(self._code),
+                "start": block_start,
+                "end": start + len(line),
+                "closed": True
+            }
+            self._current, self._code = None, None
+            return block
+        self._code.append(line + "\n" if consumed > len(line) else line)
+        return None
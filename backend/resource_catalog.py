@@ -0,0 +1,325 @@
+import os
+import re
+import json
+import socket
+import sqlite3
+import ipaddress
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlsplit
+
+
+CATEGORIES = ("books", "online_courses", "websites", "youtube_channels")
+
+# Fields an item must have, and which of them must be a web link
+REQUIRED_FIELDS = {
+    "books": ("title", "author", "description"),
+    "online_courses": ("platform", "course_name", "url", "description"),
+    "websites": ("name", "url", "description"),
+    "youtube_channels": ("channel_name", "url", "description"),
+}
+IDENTITY_FIELD = {
+    "books": "title",
+    "online_courses": "url",
+    "websites": "url",
+    "youtube_channels": "url",
+}
+
+# Only grammar and request phrasing are dropped; subject words such as "learning" or
+# "design" are what tell "Machine Learning" from "Machine Design", so they always stay
+_STOPWORDS = {"a", "an", "and", "the", "of", "for", "to", "in", "on", "with", "about", "i", "want", "how", "learn"}
+
+# Request phrasing in front of the subject: "I want to learn about ...", "Introduction to ..."
+_FILLER_PREFIX = re.compile(
+    r"^(?:(?:i want to|i'd like to|how to|help me)\s+)?(?:learn(?:ing)? about\s+|learn\s+)?"
+    r"(?:(?:an?\s+)?(?:introduction|intro|basics|fundamentals|beginner'?s? guide|guide)\s+(?:to|of|for)\s+)?",
+    re.I
+)
+
+
+def topic_keywords(topic):
+    """Lower-cased content words of a topic's subject; these are what the index matches on"""
+    subject = _FILLER_PREFIX.sub("", (topic or "").strip().lower())
+    words = re.findall(r"[a-z0-9+#]+", subject)
+    keywords = [word for word in words if word not in _STOPWORDS]
+    return keywords or words
+
+
+def valid_items(category, items):
+    """Items with every required field filled in and real http(s) links, de-duplicated"""
+    valid, seen = [], set()
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        item = {key: str(value).strip() for key, value in item.items() if value is not None}
+        if not all(item.get(field) for field in REQUIRED_FIELDS[category]):
+            continue
+        if "url" in REQUIRED_FIELDS[category] and not re.match(r"https?://[^\s/]+\.[^\s]+", item["url"]):
+            continue
+        identity = item[IDENTITY_FIELD[category]].lower().rstrip("/")
+        if identity in seen:
+            continue
+        seen.add(identity)
+        valid.append(item)
+    return valid
+
+
+def _public_address(address):
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if getattr(ip, "ipv4_mapped", None):
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+
+def is_public_url(url):
+    """True for http(s) URLs whose host only resolves to public addresses.
+
+    The links come from model output, so without this check a generated
+    URL could make the server probe its own network.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                                   type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return False
+    return bool(infos) and all(_public_address(info[4][0]) for info in infos)
+
+
+def check_links(urls, timeout=5.0, max_workers=8, max_redirects=5):
+    """Map each URL to whether it resolves; links that 404 or don't connect are dead.
+
+    Redirects are followed by hand so every hop is checked with
+    `is_public_url` before it is requested.
+    """
+    import httpx
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch(method, url):
+        for _ in range(max_redirects + 1):
+            if not is_public_url(url):
+                return None
+            if method == "HEAD":
+                response = client.head(url)
+            else:
+                # Read only the status line of a GET
+                with client.stream("GET", url) as response:
+                    pass
+            if not response.is_redirect:
+                return response
+            url = urljoin(url, response.headers["location"])
+        return None
+
+    def alive(url):
+        try:
+            response = fetch("HEAD", url)
+            if response is not None and response.status_code in (405, 501):
+                # Some servers don't answer HEAD
+                response = fetch("GET", url)
+        except httpx.HTTPError:
+            return False
+        if response is None:
+            return False
+        # Sites that block bots or rate-limit still exist
+        return response.status_code < 400 or response.status_code in (401, 403, 429)
+
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with httpx.Client(timeout=timeout, follow_redirects=False,
+                      headers={"User-Agent": "Mozilla/5.0 (resource link check)"}) as client:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+            return dict(zip(urls, pool.map(alive, urls)))
+
+
+class ResourceCatalog:
+    """SQLite index of validated resources from earlier generations, searched by topic keywords.
+
+    Topics go into an FTS5 table, so a lookup is one index query instead of
+    an agent run. A category is only stored, and only served, when it has
+    at least `min_items` validated items (whose links resolve, when a
+    `link_checker` is given). Entries older
+    than `max_age_days` are no longer served, so the next request for the
+    topic generates and stores fresh ones.
+    """
+
+    def __init__(self, db_path="resource_catalog.db", min_items=3, min_overlap=0.75,
+                 max_age_days=30, link_checker=None):
+        self.db_path = db_path
+        self.min_items = min_items
+        self.min_overlap = min_overlap
+        self.max_age_days = max_age_days
+        self.link_checker = link_checker
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    topic_key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    learning_plan TEXT,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS resources (
+                    topic_key TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    items TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (topic_key, category)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS topic_index USING fts5(
+                    topic_key UNINDEXED, keywords
+                );
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def record(self, topic, result):
+        """Index a generated result; returns the categories that passed validation"""
+        keywords = topic_keywords(topic)
+        if not keywords:
+            return []
+        topic_key = " ".join(keywords)
+        now = datetime.now().isoformat()
+        candidates = {category: valid_items(category, result.get(category)) for category in CATEGORIES}
+        if self.link_checker:
+            # Hallucinated links would otherwise be served to everyone who asks later
+            links = [item["url"] for items in candidates.values() for item in items if item.get("url")]
+            alive = self.link_checker(links)
+            candidates = {
+                category: [item for item in items if not item.get("url") or alive.get(item["url"])]
+                for category, items in candidates.items()
+            }
+        stored = []
+        with self._connect() as conn:
+            plan = result.get("learning_plan")
+            conn.execute(
+                "INSERT INTO topics (topic_key, topic, learning_plan, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(topic_key) DO UPDATE SET topic = excluded.topic, "
+                "learning_plan = COALESCE(excluded.learning_plan, topics.learning_plan), "
+                "updated_at = excluded.updated_at",
+                (topic_key, topic.strip(), plan if isinstance(plan, str) and plan.strip() else None, now)
+            )
+            conn.execute("DELETE FROM topic_index WHERE topic_key = ?", (topic_key,))
+            conn.execute("INSERT INTO topic_index (topic_key, keywords) VALUES (?, ?)", (topic_key, topic_key))
+            for category in CATEGORIES:
+                items = candidates[category]
+                if len(items) < self.min_items:
+                    continue
+                conn.execute(
+                    "INSERT INTO resources (topic_key, category, items, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(topic_key, category) DO UPDATE SET items = excluded.items, "
+                    "updated_at = excluded.updated_at",
+                    (topic_key, category, json.dumps(items), now)
+                )
+                stored.append(category)
+        return stored
+
+    def forget(self, topic):
+        """Drop everything stored for a topic, e.g. before regenerating it on request"""
+        keywords = topic_keywords(topic)
+        if not keywords:
+            return
+        topic_key = " ".join(keywords)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM resources WHERE topic_key = ?", (topic_key,))
+            conn.execute("DELETE FROM topics WHERE topic_key = ?", (topic_key,))
+            conn.execute("DELETE FROM topic_index WHERE topic_key = ?", (topic_key,))
+
+    def _cutoff(self):
+        if not self.max_age_days:
+            return ""
+        return (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+
+    def _best_topic(self, keywords):
+        """The indexed topic matching the request's keywords exactly or nearly so"""
+        topic_key = " ".join(keywords)
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM topics WHERE topic_key = ?", (topic_key,)).fetchone():
+            return topic_key, True
+        # Every requested keyword has to appear; bm25 ranks the rest
+        query = " AND ".join('"' + keyword.replace('"', '""') + '"' for keyword in keywords)
+        try:
+            rows = conn.execute(
+                "SELECT topic_key FROM topic_index WHERE topic_index MATCH ? ORDER BY rank LIMIT 10",
+                (query,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return None, False
+        wanted = set(keywords)
+        best, best_overlap = None, self.min_overlap
+        for row in rows:
+            found = set(row["topic_key"].split())
+            overlap = len(wanted & found) / len(wanted | found)
+            if overlap >= best_overlap:
+                best, best_overlap = row["topic_key"], overlap
+        return best, False
+
+    def lookup(self, topic):
+        """Known parts of a result for `topic`.
+
+        Returns a dict holding the categories found, plus `learning_plan`
+        when the topic itself (not just a similar one) has been generated before.
+        """
+        keywords = topic_keywords(topic)
+        if not keywords:
+            return {}
+        topic_key, exact = self._best_topic(keywords)
+        if topic_key is None:
+            return {}
+        conn = self._connect()
+        cutoff = self._cutoff()
+        found = {}
+        for row in conn.execute(
+                "SELECT category, items FROM resources WHERE topic_key = ? AND updated_at >= ?",
+                (topic_key, cutoff)).fetchall():
+            items = json.loads(row["items"])
+            if row["category"] in CATEGORIES and len(items) >= self.min_items:
+                found[row["category"]] = items
+        if exact:
+            row = conn.execute(
+                "SELECT learning_plan FROM topics WHERE topic_key = ? AND updated_at >= ?", (topic_key, cutoff)
+            ).fetchone()
+            if row and row["learning_plan"]:
+                found["learning_plan"] = row["learning_plan"]
+        return found
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            "topics": conn.execute("SELECT COUNT(*) FROM topics").fetchone()[0],
+            "categories": conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0],
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Process-wide catalog; RESOURCE_CATALOG_DB picks the file and an empty value disables it.
+
+    RESOURCE_CATALOG_TTL_DAYS sets how long entries are served.
+    RESOURCE_CATALOG_CHECK_LINKS=1 turns on link checks; they make outbound
+    requests while the result is indexed, which can add up to the check
+    timeout (5s) to a generation, so they are off by default.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                db_path = os.getenv("RESOURCE_CATALOG_DB", "resource_catalog.db")
+                _catalog = ResourceCatalog(
+                    db_path,
+                    max_age_days=float(os.getenv("RESOURCE_CATALOG_TTL_DAYS", "30")),
+                    link_checker=check_links if os.getenv("RESOURCE_CATALOG_CHECK_LINKS", "0") == "1" else None
+                ) if db_path else False
+    return _catalog or None
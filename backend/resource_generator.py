@@ -1,98 +1,115 @@
-
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 import os
-import re
 import json
-import multiprocessing
+import asyncio
+import threading
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from crewai import Agent, Task, Crew, Process as CrewProcess
+from llm_client import GeminiLLM
+from markdown_fences import tokenize_fences
+from single_flight import SingleFlight, normalize_key
+from crew_jobs import create_job_router, get_job_manager
+from resource_catalog import CATEGORIES, REQUIRED_FIELDS, get_catalog
+from instrumentation import TRACE_HEADER, CrewTaskTimer, instrument_app
+from admission import admit_requests
+from llm_scheduler import BATCH, SchedulerTimeout, request_context, surface_timeouts
+
 
+llm = GeminiLLM()
 
-os.environ["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY")
 
-class GeminiLLM:
-    def __init__(self, model_name="gemini/gemini-2.0-flash-lite"):
-        self.model_name = model_name
+@lru_cache(maxsize=None)
+def get_agents():
+    """Build the CrewAI agents on first use, so importing this module doesn't load crewai"""
+    from crewai import Agent
     
-    def generate(self, messages):
-        import litellm
-        response = litellm.completion(
-            model=self.model_name,
-            messages=messages
-        )
-        return response.choices[0].message.content
-        
-    def chat(self, messages):
-        return self.generate(messages)
+    resource_planner = Agent(
+        role="Learning Resource Planner",
+        goal="Plan a comprehensive learning journey for any topic",
+        backstory="""You are an expert education consultant with decades of experience
+        designing personalized learning paths. You understand how different people
+        learn and what combination of resources works best for different subjects.""",
+        llm=llm,
+        verbose=True
+    )
 
-llm = GeminiLLM()
+    book_specialist = Agent(
+        role="Book Specialist",
+        goal="Find the most relevant and high-quality books on any subject",
+        backstory="""You are a librarian and literary critic with comprehensive knowledge
+        of academic and popular books across all fields. You can identify which books
+        are foundational, which are cutting-edge, and which are most appropriate
+        for different levels of expertise.""",
+        llm=llm,
+        verbose=True
+    )
+
+    online_course_expert = Agent(
+        role="Online Course Expert",
+        goal="Identify the best online courses and learning platforms for any topic",
+        backstory="""You have personally reviewed thousands of online courses across
+        major platforms like Coursera, Udemy, edX, and specialized learning sites.
+        You understand which courses provide the best value, which have the best
+        instructors, and which are most up-to-date.""",
+        llm=llm,
+        verbose=True
+    )
 
+    web_resource_curator = Agent(
+        role="Web Resource Curator",
+        goal="Curate the most valuable websites, blogs, and online communities for learning",
+        backstory="""You are a digital librarian who specializes in finding high-quality
+        web resources. You know which websites provide the most accurate information,
+        which forums have the most helpful communities, and which blogs are written
+        by genuine experts.""",
+        llm=llm,
+        verbose=True
+    )
 
-resource_planner = Agent(
-    role="Learning Resource Planner",
-    goal="Plan a comprehensive learning journey for any topic",
-    backstory="""You are an expert education consultant with decades of experience
-    designing personalized learning paths. You understand how different people
-    learn and what combination of resources works best for different subjects.""",
-    llm=llm,
-    verbose=True
-)
-
-book_specialist = Agent(
-    role="Book Specialist",
-    goal="Find the most relevant and high-quality books on any subject",
-    backstory="""You are a librarian and literary critic with comprehensive knowledge
-    of academic and popular books across all fields. You can identify which books
-    are foundational, which are cutting-edge, and which are most appropriate
-    for different levels of expertise.""",
-    llm=llm,
-    verbose=True
-)
-
-online_course_expert = Agent(
-    role="Online Course Expert",
-    goal="Identify the best online courses and learning platforms for any topic",
-    backstory="""You have personally reviewed thousands of online courses across
-    major platforms like Coursera, Udemy, edX, and specialized learning sites.
-    You understand which courses provide the best value, which have the best
-    instructors, and which are most up-to-date.""",
-    llm=llm,
-    verbose=True
-)
-
-web_resource_curator = Agent(
-    role="Web Resource Curator",
-    goal="Curate the most valuable websites, blogs, and online communities for learning",
-    backstory="""You are a digital librarian who specializes in finding high-quality
-    web resources. You know which websites provide the most accurate information,
-    which forums have the most helpful communities, and which blogs are written
-    by genuine experts.""",
-    llm=llm,
-    verbose=True
-)
-
-video_content_researcher = Agent(
-    role="Video Content Researcher",
-    goal="Discover the best YouTube channels and video content for effective learning",
-    backstory="""You are a media researcher who specializes in educational video content.
-    You can identify which YouTube channels provide the clearest explanations,
-    which have the most engaging teaching styles, and which cover topics most
-    comprehensively.""",
-    llm=llm,
-    verbose=True
-)
-
-def create_learning_resources_crew(topic):
-    """Create and return a CrewAI Crew with learning resource generation tasks."""
+    video_content_researcher = Agent(
+        role="Video Content Researcher",
+        goal="Discover the best YouTube channels and video content for effective learning",
+        backstory="""You are a media researcher who specializes in educational video content.
+        You can identify which YouTube channels provide the clearest explanations,
+        which have the most engaging teaching styles, and which cover topics most
+        comprehensively.""",
+        llm=llm,
+        verbose=True
+    )
+    
+    return (resource_planner, book_specialist, online_course_expert,
+            web_resource_curator, video_content_researcher)
+
+# Label used in the compile task's JSON outline for each category
+CATEGORY_LABELS = {
+    "books": "book",
+    "online_courses": "course",
+    "websites": "website",
+    "youtube_channels": "channel",
+}
+
+def create_learning_resources_crew(topic, task_callback=None, categories=CATEGORIES):
+    """Create and return a CrewAI Crew with learning resource generation tasks.
+
+    Only the research tasks for `categories` are included; with none, the
+    crew just writes the learning plan.
+    """
+    from crewai import Task, Crew, Process as CrewProcess
+    
+    (resource_planner, book_specialist, online_course_expert,
+     web_resource_curator, video_content_researcher) = get_agents()
     
     # Task 1: Plan the learning journey
     plan_learning = Task(
+        name="plan_learning",
         description=f"""
         Create a comprehensive learning plan for the topic: '{topic}'.
         Analyze what subtopics should be covered and in what order.
@@ -106,11 +123,13 @@ def create_learning_resources_crew(topic):
         3. Recommended mix of resource types
         4. Considerations for different learning styles
         """,
-        agent=resource_planner
+        agent=resource_planner,
+        callback=task_callback
     )
     
     # Task 2: Research book recommendations
     research_books = Task(
+        name="research_books",
         description=f"""
         Identify the 5 best books for learning about '{topic}'.
         For each book, provide:
@@ -134,11 +153,13 @@ def create_learning_resources_crew(topic):
         """,
         expected_output="A list of 5 well-researched book recommendations in JSON format",
         agent=book_specialist,
-        context=[plan_learning]
+        context=[plan_learning],
+        callback=task_callback
     )
     
     # Task 3: Research online courses
     research_courses = Task(
+        name="research_courses",
         description=f"""
         Identify the 5 best online courses for learning about '{topic}'.
         For each course, provide:
@@ -164,11 +185,13 @@ def create_learning_resources_crew(topic):
         """,
         expected_output="A list of 5 well-researched online course recommendations in JSON format",
         agent=online_course_expert,
-        context=[plan_learning]
+        context=[plan_learning],
+        callback=task_callback
     )
     
     # Task 4: Research websites and online resources
     research_websites = Task(
+        name="research_websites",
         description=f"""
         Identify the 5 best websites and online resources for learning about '{topic}'.
         For each website, provide:
@@ -193,11 +216,13 @@ def create_learning_resources_crew(topic):
         """,
         expected_output="A list of 5 well-researched website recommendations in JSON format",
         agent=web_resource_curator,
-        context=[plan_learning]
+        context=[plan_learning],
+        callback=task_callback
     )
     
     # Task 5: Research YouTube channels and video content
     research_videos = Task(
+        name="research_videos",
         description=f"""
         Identify the 5 best YouTube channels and video content creators for learning about '{topic}'.
         For each channel, provide:
@@ -221,37 +246,52 @@ def create_learning_resources_crew(topic):
         """,
         expected_output="A list of 5 well-researched YouTube channel recommendations in JSON format",
         agent=video_content_researcher,
-        context=[plan_learning]
+        context=[plan_learning],
+        callback=task_callback
     )
     
-    # Task 6: Compile and finalize all resources
-    compile_resources = Task(
-        description=f"""
-        Compile all the researched resources into a comprehensive learning guide for '{topic}'.
-        Review all resources for quality and relevance.
-        Ensure there's a good mix of resource types and difficulty levels.
-        Format everything as a structured JSON object with sections for each resource type.
+    research = {
+        "books": (research_books, book_specialist),
+        "online_courses": (research_courses, online_course_expert),
+        "websites": (research_websites, web_resource_curator),
+        "youtube_channels": (research_videos, video_content_researcher),
+    }
+    research_tasks = [research[category][0] for category in categories]
+    agents = [resource_planner] + [research[category][1] for category in categories]
+    tasks = [plan_learning] + research_tasks
+    
+    if research_tasks:
+        outline = ",\n".join(
+            f'                "{category}": [...{CATEGORY_LABELS[category]} objects...]'
+            for category in categories
+        )
         
-        The final JSON structure should be exactly:
-        {{
-            "learning_plan": "Overall learning strategy and approach",
-            "books": [...book objects...],
-            "online_courses": [...course objects...],
-            "websites": [...website objects...],
-            "youtube_channels": [...channel objects...]
-        }}
-        """,
-        expected_output="A complete, well-structured learning resources guide in JSON format",
-        agent=resource_planner,
-        context=[plan_learning, research_books, research_courses, research_websites, research_videos]
-    )
+        # Task 6: Compile and finalize all resources
+        compile_resources = Task(
+            name="compile_resources",
+            description=f"""
+            Compile all the researched resources into a comprehensive learning guide for '{topic}'.
+            Review all resources for quality and relevance.
+            Ensure there's a good mix of resource types and difficulty levels.
+            Format everything as a structured JSON object with sections for each resource type.
+            
+            The final JSON structure should be exactly:
+            {{
+                "learning_plan": "Overall learning strategy and approach",
+{outline}
+            }}
+            """,
+            expected_output="A complete, well-structured learning resources guide in JSON format",
+            agent=resource_planner,
+            context=[plan_learning] + research_tasks,
+            callback=task_callback
+        )
+        tasks.append(compile_resources)
     
     # Create the crew
     crew = Crew(
-        agents=[resource_planner, book_specialist, online_course_expert, 
-                web_resource_curator, video_content_researcher],
-        tasks=[plan_learning, research_books, research_courses, 
-               research_websites, research_videos, compile_resources],
+        agents=agents,
+        tasks=tasks,
         verbose=True,
         process=CrewProcess.sequential  # Renamed to avoid conflict with multiprocessing.Process
     )
@@ -261,13 +301,11 @@ def create_learning_resources_crew(topic):
 def extract_json(text):
     """Extract valid JSON from text that might contain markdown or other content"""
     # Look for JSON blocks in markdown code blocks
-    json_pattern = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
-    match = json_pattern.search(text)
-    
-    if match:
-        json_str = match.group(1)
+    for block in tokenize_fences(text):
+        if block["language"] not in (None, "json"):
+            continue
         try:
-            return json.loads(json_str)
+            return json.loads(block["code"])
         except json.JSONDecodeError:
             pass
     
@@ -285,10 +323,73 @@ def extract_json(text):
     # Return the original text if no JSON could be extracted
     return {"error": "Could not extract valid JSON", "raw_text": text}
 
-def generate_learning_resources(topic):
-    """Generate learning resources for a specified topic"""
-    crew = create_learning_resources_crew(topic)
-    result = crew.kickoff()
+def extract_json_list(text):
+    """Extract the JSON array a research task was asked for, or None"""
+    for block in tokenize_fences(text):
+        if block["language"] not in (None, "json"):
+            continue
+        try:
+            return json.loads(block["code"])
+        except json.JSONDecodeError:
+            pass
+    
+    start = text.find('[')
+    end = text.rfind(']') + 1
+    if start != -1 and end != 0:
+        try:
+            return json.loads(text[start:end])
+        except json.JSONDecodeError:
+            pass
+    return None
+
+def category_items(category, text):
+    """Items of a research task's output that fit ResourcesResponse, or None if none do"""
+    items = extract_json_list(text)
+    if isinstance(items, dict):
+        items = items.get(category)
+    if not isinstance(items, list):
+        return None
+    # Same shape as the ResourcesResponse field (Dict[str, str]) with the category's fields filled in
+    items = [
+        {key: str(value).strip() for key, value in item.items() if value is not None}
+        for item in items if isinstance(item, dict)
+    ]
+    items = [item for item in items if all(item.get(field) for field in REQUIRED_FIELDS[category])]
+    return items or None
+
+def _task_text(output):
+    """Plain text of a crew TaskOutput, across crewai versions"""
+    for attr in ("raw", "raw_output", "exported_output"):
+        value = getattr(output, attr, None)
+        if isinstance(value, str):
+            return value
+    return str(output) if output is not None else ""
+
+def generate_learning_resources(topic, progress=None, refresh=False, known=None):
+    """Generate learning resources for a specified topic.
+
+    Categories already in the resource catalog for this or a closely matching
+    topic are served from it; agents only research the rest. Callers that
+    already looked the topic up pass the result as `known`. With `refresh`
+    everything is regenerated and replaces what the catalog held for the topic.
+    """
+    catalog = get_catalog()
+    if known is None:
+        known = catalog.lookup(topic) if catalog and not refresh else {}
+    missing = [category for category in CATEGORIES if category not in known]
+    if not missing and "learning_plan" in known:
+        if progress:
+            progress.start([])
+        return known
+    
+    task_timer = CrewTaskTimer(progress.task_done if progress else None)
+    crew = create_learning_resources_crew(topic, task_timer.task_done, missing)
+    task_names = [task.name for task in crew.tasks]
+    if progress:
+        progress.start(task_names)
+    task_timer.start(task_names)
+    with surface_timeouts():
+        result = crew.kickoff()
     
     # Get the string output from the CrewOutput object
     if hasattr(result, 'raw_output'):
@@ -298,13 +399,195 @@ def generate_learning_resources(topic):
     else:
         result_text = str(result)
     
-    # Extract JSON from the result
-    resources_data = extract_json(result_text)
+    if not missing:
+        # Only the plan was written, as plain text
+        resources_data = {"learning_plan": result_text.strip()}
+    else:
+        # Extract JSON from the result
+        resources_data = extract_json(result_text)
+        if "error" in resources_data and "raw_text" in resources_data:
+            return resources_data
+    
+    # Catalog categories were validated already, so they win over anything the compiler repeated
+    resources_data = {**known, **resources_data, **{
+        category: items for category, items in known.items() if category in CATEGORIES
+    }}
+    if catalog:
+        try:
+            if refresh:
+                catalog.forget(topic)
+            catalog.record(topic, resources_data)
+        except Exception as e:
+            print(f"Error indexing resources for '{topic}': {str(e)}")
     return resources_data
 
+# Research task -> the ResourcesResponse field it fills
+RESEARCH_TASKS = {
+    "research_books": "books",
+    "research_courses": "online_courses",
+    "research_websites": "websites",
+    "research_videos": "youtube_channels",
+}
+
+class ResourceStream:
+    """Progress hook for generate_learning_resources that publishes each task's result as it finishes.
+
+    Events go out from the crew's thread to every subscriber: the learning
+    plan, then each category whose items validate. A category that doesn't
+    validate is left for the compiled result. Subscribers that join a
+    running generation are first sent the events they missed.
+    """
+
+    def __init__(self):
+        self.task_names = []
+        self.completed = 0
+        self._events = []
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, emit):
+        with self._lock:
+            for event, data in self._events:
+                emit(event, data)
+            self._subscribers.append(emit)
+
+    def unsubscribe(self, emit):
+        with self._lock:
+            if emit in self._subscribers:
+                self._subscribers.remove(emit)
+
+    def emit(self, event, data):
+        with self._lock:
+            self._events.append((event, data))
+            for subscriber in self._subscribers:
+                subscriber(event, data)
+
+    def start(self, task_names):
+        self.task_names = list(task_names)
+        self.completed = 0
+
+    def task_done(self, output=None):
+        name = self.task_names[self.completed] if self.completed < len(self.task_names) else None
+        self.completed += 1
+        text = _task_text(output)
+        if name == "plan_learning" and text.strip():
+            self.emit("learning_plan", {"learning_plan": text.strip(), "source": "generated"})
+        elif name in RESEARCH_TASKS:
+            category = RESEARCH_TASKS[name]
+            items = category_items(category, text)
+            if items:
+                self.emit("category", {"category": category, "items": items, "source": "generated"})
+
+# Identical topics requested while a crew is running share its result
+generation_flight = SingleFlight()
+
+# Progress of each in-flight generation, so stream requests can join one already running
+_generation_streams = {}
+
+async def run_generation(topic, refresh=False, known=None, subscriber=None):
+    """Generate resources through the shared single flight, optionally following its progress"""
+    key = normalize_key("resources", topic, refresh)
+    # Nothing below awaits before generation_flight.run registers the key, so the
+    # stream found or created here is the one the running generation reports to
+    stream = _generation_streams.get(key) if generation_flight.in_flight(key) else None
+    if stream is None:
+        stream = _generation_streams[key] = ResourceStream()
+    if subscriber is not None:
+        stream.subscribe(subscriber)
+    
+    def drop_stream(_):
+        # Runs when the generation itself finishes, whether or not anyone is still listening
+        if _generation_streams.get(key) is stream:
+            del _generation_streams[key]
+    
+    try:
+        return await generation_flight.run(
+            key, generate_learning_resources, topic, stream, refresh, known, on_done=drop_stream
+        )
+    finally:
+        if subscriber is not None:
+            stream.unsubscribe(subscriber)
+
+def validate_resources(result):
+    """Check a result against ResourcesResponse; returns the validated payload"""
+    response = ResourcesResponse(**result)
+    # pydantic 2 renamed dict() to model_dump()
+    return response.model_dump() if hasattr(response, "model_dump") else response.dict()
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_learning_resources(topic, refresh=False):
+    """Yield SSE events for the learning plan and each resource category as they become ready"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    
+    def subscriber(event, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+    
+    with request_context(BATCH):
+        try:
+            # Catalog categories are one index query away, so they go out before any agent runs
+            catalog = get_catalog()
+            known = await asyncio.to_thread(catalog.lookup, topic) if catalog and not refresh else {}
+            if "learning_plan" in known:
+                yield _sse("learning_plan", {"learning_plan": known["learning_plan"], "source": "catalog"})
+            for category in CATEGORIES:
+                if category in known:
+                    yield _sse("category", {"category": category, "items": known[category], "source": "catalog"})
+            
+            generation = asyncio.ensure_future(run_generation(topic, refresh, known, subscriber))
+            try:
+                while True:
+                    next_event = asyncio.ensure_future(events.get())
+                    await asyncio.wait({next_event, generation}, return_when=asyncio.FIRST_COMPLETED)
+                    if not next_event.done():
+                        next_event.cancel()
+                        break
+                    yield _sse(*next_event.result())
+            finally:
+                # A client that disconnects stops listening; the shared generation carries on
+                if not generation.done():
+                    generation.cancel()
+            # Task callbacks were scheduled before the thread finished, so they are all queued by now
+            while not events.empty():
+                yield _sse(*events.get_nowait())
+            
+            result = generation.result()
+            if "error" in result and "raw_text" in result:
+                yield _sse("error", {"detail": result["error"], "raw_text": result["raw_text"]})
+                return
+            try:
+                payload = validate_resources(result)
+            except (TypeError, ValueError) as e:
+                # pydantic's ValidationError is a ValueError in both major versions
+                yield _sse("error", {"detail": f"Generated resources are incomplete: {str(e)}"})
+                return
+            yield _sse("done", payload)
+        except SchedulerTimeout as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield _sse("error", {"detail": f"An error occurred while generating resources: {str(e)}"})
+
+
+
+def run_resources_job(params, progress):
+    """Job runner for background resource generation"""
+    with request_context(BATCH):
+        result = generate_learning_resources(params["topic"], progress, params.get("refresh", False))
+    if "error" in result and "raw_text" in result:
+        raise ValueError(result["error"])
+    return result
+
+def start_jobs():
+    """Register the job runner and resume unfinished jobs when the server starts"""
+    get_job_manager().register("resources", run_resources_job)
+
 # Pydantic models
 class TopicRequest(BaseModel):
     topic: str
+    # Regenerate instead of serving catalog entries, and replace them with the new result
+    refresh: bool = False
 
 class ResourcesResponse(BaseModel):
     learning_plan: str
@@ -317,22 +600,20 @@ class ErrorResponse(BaseModel):
     error: str
     raw_text: Optional[str] = None
 
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
 
-app = FastAPI(
-    title="Learning Resources API",
-    description="An AI-powered API that generates comprehensive learning resources for any topic",
-    version="1.0.0"
-)
+router = APIRouter()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],  
-    allow_headers=["*"],  
-)
+# Estimated model calls per request (one call per crew task; queued jobs are bounded by the job pool instead) and priority
+ADMISSION_COSTS = {
+    ("POST", "/generate-resources"): (6, BATCH),
+    ("POST", "/generate-resources/stream"): (6, BATCH),
+}
 
-@app.post("/generate-resources", response_model=ResourcesResponse, responses={400: {"model": ErrorResponse}})
+@router.post("/generate-resources", response_model=ResourcesResponse, responses={400: {"model": ErrorResponse}})
 async def generate_resources(request: TopicRequest):
     """
     Generate comprehensive learning resources for the provided topic.
@@ -349,17 +630,54 @@ async def generate_resources(request: TopicRequest):
     
     try:
         
-        result = generate_learning_resources(request.topic)
+        with request_context(BATCH):
+            result = await run_generation(request.topic, request.refresh)
         
         
         if "error" in result and "raw_text" in result:
             raise HTTPException(status_code=400, detail=result)
         
         return result
+    except SchedulerTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while generating resources: {str(e)}")
 
-@app.get("/")
+@router.post("/generate-resources/stream")
+async def generate_resources_stream(request: TopicRequest):
+    """
+    Server-sent events variant of /generate-resources.
+    
+    Emits a `learning_plan` event, then a `category` event (`books`,
+    `online_courses`, `websites` or `youtube_channels`) as each research task
+    finishes with items that fit ResourcesResponse, and a final `done` event
+    carrying the result validated against ResourcesResponse (or `error` if it
+    doesn't validate). A later event for the same plan or category replaces
+    the earlier one. Identical requests share one generation, streamed or not.
+    """
+    if not request.topic or len(request.topic.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Topic cannot be empty")
+    
+    return StreamingResponse(
+        stream_learning_resources(request.topic, request.refresh),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/jobs/generate-resources", response_model=JobSubmitted, status_code=202)
+async def submit_resources_job(request: TopicRequest):
+    """
+    Queue resource generation in the background and return a job id.
+    
+    Poll `/jobs/{job_id}` for progress and fetch `/jobs/{job_id}/result` when it has succeeded.
+    """
+    if not request.topic or len(request.topic.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Topic cannot be empty")
+    
+    job_id = get_job_manager().submit("resources", {"topic": request.topic, "refresh": request.refresh})
+    return JobSubmitted(job_id=job_id, status="queued")
+
+@router.get("/")
 async def root():
     """Welcome endpoint with API usage information"""
     return {
@@ -367,9 +685,42 @@ async def root():
         "usage": "Send a POST request to /generate-resources with a JSON body containing a 'topic' field"
     }
 
-# Main entry point fixed to handle multiprocessing correctly
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_jobs()
+    yield
+
+def create_app():
+    """Build the resources app; crewai and the job pool are only loaded when needed"""
+    app = FastAPI(
+        title="Learning Resources API",
+        description="An AI-powered API that generates comprehensive learning resources for any topic",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    
+    # Added before CORS so shed requests still carry CORS headers
+    admit_requests(app, ADMISSION_COSTS)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  
+        allow_credentials=True,
+        allow_methods=["*"],  
+        allow_headers=["*"],  
+        expose_headers=[TRACE_HEADER, "Retry-After"],
+    )
+    
+    instrument_app(app, "resource_generator")
+    app.include_router(router)
+    app.include_router(create_job_router("resources"))
+    return app
+
+app = create_app()
 
-import uvicorn
-uvicorn.run(app, host="localhost", port=8000)
+# Main entry point fixed to handle multiprocessing correctly
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="localhost", port=8000)
 
 
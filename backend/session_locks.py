@@ -0,0 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class SessionBusy(Exception):
+    """Raised when a session already has too many turns waiting"""
+
+    def __init__(self, key, waiting):
+        super().__init__(f"Session {key} already has {waiting} requests waiting")
+        self.key = key
+        self.waiting = waiting
+
+
+class SessionLocks:
+    """One asyncio lock per session key, created on demand and dropped when idle.
+
+    Requests for the same key run one at a time in arrival order, while
+    different keys never wait on each other. Locks are per process, so with
+    several workers a session is only ordered within the worker that serves it.
+    """
+
+    def __init__(self, max_waiting=None):
+        self.max_waiting = max_waiting
+        self._locks = {}  # key -> [lock, holders and waiters]
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        elif self.max_waiting is not None and entry[1] > self.max_waiting:
+            raise SessionBusy(key, entry[1] - 1)
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    async def run(self, key, fn, *args):
+        """Run blocking `fn(*args)` in a worker thread while holding `key`'s lock.
+
+        The lock is kept until the thread finishes even if the caller goes
+        away, so an abandoned turn can't overlap the next one.
+        """
+        async with self.hold(key):
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                await asyncio.wait({task})
+                raise
+
+    def stats(self):
+        return {
+            "active_sessions": len(self._locks),
+            "waiting": sum(max(count - 1, 0) for _, count in self._locks.values()),
+        }
@@ -0,0 +1,59 @@
+import re
+import copy
+import asyncio
+
+
+def normalize_key(*parts):
+    """Build a coalescing key that ignores case, extra whitespace and trailing punctuation"""
+    normalized = []
+    for part in parts:
+        if isinstance(part, str):
+            part = re.sub(r"\s+", " ", part).strip().strip(".!?").lower()
+        normalized.append(part)
+    return tuple(normalized)
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one shared execution.
+
+    The first caller for a key runs the work; callers that arrive while it is
+    in flight await the same result. Every caller gets its own deep copy, so
+    handlers can decorate the result without affecting each other.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    async def run(self, key, fn, *args, on_done=None):
+        """Run blocking `fn(*args)` in a worker thread, shared by all callers with `key`.
+
+        `on_done(task)` is called when the shared execution finishes, even if
+        this caller has gone away by then.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            # The work runs as its own task so one caller disconnecting doesn't cancel it for the rest
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+            self._stats["executions"] += 1
+        else:
+            self._stats["coalesced"] += 1
+        if on_done is not None:
+            task.add_done_callback(on_done)
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def in_flight(self, key):
+        """Whether work for `key` is running right now"""
+        return key in self._inflight
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller went away
+            task.exception()
+
+    def stats(self):
+        return dict(self._stats, in_flight=len(self._inflight))
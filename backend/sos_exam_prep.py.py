@@ -1,17 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
-import litellm
+from contextlib import asynccontextmanager
 from enum import Enum
 from dotenv import load_dotenv
 
-from crewai import Agent, Task, Crew, Process
+from llm_client import GeminiLLM
+from llm_scheduler import BATCH, SchedulerTimeout, request_context, surface_timeouts
+from single_flight import SingleFlight, normalize_key
+from crew_jobs import create_job_router, get_job_manager
+from instrumentation import TRACE_HEADER, CrewTaskTimer, instrument_app
+from admission import admit_requests
 
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
-os.environ["GEMINI_API_KEY"] = API_KEY
 
 class StudyAidType(Enum):
     CHEAT_SHEET = "cheat sheet"
@@ -35,6 +39,9 @@ class StudyAidCreator:
         
     def create_agents(self):
         """Create and return the agents for the study aid creation process"""
+        # crewai is imported on first use so importing this module stays cheap
+        from crewai import Agent
+        
         researcher = Agent(
             role="Content Researcher",
             goal="Research accurate information for exam topics",
@@ -61,7 +68,7 @@ class StudyAidCreator:
         
         return [researcher, creator, reviewer]
     
-    def create_tasks(self, topic: str, aid_type: StudyAidType, agents: list):
+    def create_tasks(self, topic: str, aid_type: StudyAidType, agents: list, task_callback=None):
         """
         Create tasks for the study aid creation process
         
@@ -69,33 +76,42 @@ class StudyAidCreator:
             topic: The academic topic to create materials for
             aid_type: The type of study aid from StudyAidType enum
             agents: List of agents [researcher, creator, reviewer]
+            task_callback: Optional callable run after each task finishes
         
         Returns:
             List of tasks
         """
+        from crewai import Task
+        
         # Create specific instructions based on aid type
         research_instructions = self._get_research_instructions(aid_type, topic)
         creation_instructions = self._get_creation_instructions(aid_type, topic)
         review_instructions = self._get_review_instructions(aid_type, topic)
         
         research_task = Task(
+            name="research",
             description=f"Research the topic '{topic}' for creating a '{aid_type.value}'.\n{research_instructions}",
             expected_output="Comprehensive research notes containing key information needed for the specific study aid type.",
-            agent=agents[0]  # researcher
+            agent=agents[0],  # researcher
+            callback=task_callback
         )
         
         create_task = Task(
+            name="create",
             description=f"Create a {aid_type.value} for '{topic}' based on the research.\n{creation_instructions}",
             expected_output=f"A well-structured {aid_type.value} with essential information, formatted for easy reading and quick review.",
             agent=agents[1],  # creator
-            context=[research_task]
+            context=[research_task],
+            callback=task_callback
         )
         
         review_task = Task(
+            name="review",
             description=f"Review and improve the {aid_type.value} for accuracy, clarity, and effectiveness.\n{review_instructions}",
             expected_output="A polished final study aid that is accurate, clear, and optimized for last-minute exam preparation.",
             agent=agents[2],  # reviewer
-            context=[create_task]
+            context=[create_task],
+            callback=task_callback
         )
         
         return [research_task, create_task, review_task]
@@ -142,13 +158,14 @@ class StudyAidCreator:
         }
         return instructions.get(aid_type, "Ensure the study aid is accurate, concise, and effectively serves last-minute exam preparation.")
     
-    def create_crew(self, topic: str, aid_type_str: str):
+    def create_crew(self, topic: str, aid_type_str: str, task_callback=None):
         """
         Create a complete crew for generating the study aid
         
         Args:
             topic: The academic topic to create materials for
             aid_type_str: String representation of the study aid type
+            task_callback: Optional callable run after each task finishes
             
         Returns:
             CrewAI Crew object ready to kickoff
@@ -160,8 +177,10 @@ class StudyAidCreator:
             # Default to cheat sheet if not found
             aid_type = StudyAidType.CHEAT_SHEET
             
+        from crewai import Crew, Process
+        
         agents = self.create_agents()
-        tasks = self.create_tasks(topic, aid_type, agents)
+        tasks = self.create_tasks(topic, aid_type, agents, task_callback)
         
         crew = Crew(
             agents=agents,
@@ -172,20 +191,42 @@ class StudyAidCreator:
         
         return crew
 
-# Define the custom LLM class for CrewAI
-class GeminiLLM:
-    def __init__(self, model_name="gemini/gemini-2.0-flash-lite"):
-        self.model_name = model_name
+def generate_study_aid_text(topic: str, aid_type: str, progress=None) -> str:
+    """Run the study aid crew for a topic and return its final output as text"""
+    # Initialize our LLM
+    llm = GeminiLLM()
     
-    def generate(self, messages):
-        response = litellm.completion(
-            model=self.model_name,
-            messages=messages
-        )
-        return response.choices[0].message.content
-        
-    def chat(self, messages):
-        return self.generate(messages)
+    # Create the study aid system
+    study_aid_system = StudyAidCreator(llm)
+    
+    # Create and run the crew
+    task_timer = CrewTaskTimer(progress.task_done if progress else None)
+    crew = study_aid_system.create_crew(topic, aid_type, task_timer.task_done)
+    task_names = [task.name for task in crew.tasks]
+    if progress:
+        progress.start(task_names)
+    task_timer.start(task_names)
+    with surface_timeouts():
+        result = crew.kickoff()
+    
+    # Extract the result as a string
+    if hasattr(result, 'raw'):
+        return result.raw
+    # Fallback to string conversion if .raw doesn't exist
+    return str(result)
+
+# Identical requests that arrive while a crew is running share its result
+generation_flight = SingleFlight()
+
+def run_study_aid_job(params, progress):
+    """Job runner for background study aid generation"""
+    with request_context(BATCH):
+        result_str = generate_study_aid_text(params["topic"], params["aid_type"], progress)
+    return {"result": result_str, "aid_type": params["aid_type"], "topic": params["topic"]}
+
+def start_jobs():
+    """Register the job runner and resume unfinished jobs when the server starts"""
+    get_job_manager().register("study-aid", run_study_aid_job)
 
 # Create Pydantic models for request/response validation
 class StudyAidRequest(BaseModel):
@@ -197,23 +238,16 @@ class StudyAidResponse(BaseModel):
     aid_type: str
     topic: str
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Study Aid Generator API",
-    description="An API that generates different types of study aids for various academic topics",
-    version="1.0.0",
-)
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
+router = APIRouter()
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
+# Estimated model calls per request (research, create and review tasks) and priority
+ADMISSION_COSTS = {("POST", "/generate-study-aid"): (3, BATCH)}
 
-@app.post("/generate-study-aid", response_model=StudyAidResponse)
+@router.post("/generate-study-aid", response_model=StudyAidResponse)
 async def generate_study_aid(request: StudyAidRequest):
     """
     Generate a study aid for a specific topic and type.
@@ -225,23 +259,14 @@ async def generate_study_aid(request: StudyAidRequest):
     if not request.topic.strip():
         raise HTTPException(status_code=400, detail="Topic cannot be empty")
     
-    # Initialize our LLM
-    llm = GeminiLLM()
-    
     try:
-        # Create the study aid system
-        study_aid_system = StudyAidCreator(llm)
-        
-        # Create and run the crew
-        crew = study_aid_system.create_crew(request.topic, request.aid_type)
-        result = crew.kickoff()
-        
-        # Extract the result as a string
-        if hasattr(result, 'raw'):
-            result_str = result.raw
-        else:
-            # Fallback to string conversion if .raw doesn't exist
-            result_str = str(result)
+        with request_context(BATCH):
+            result_str = await generation_flight.run(
+                normalize_key("study-aid", request.topic, request.aid_type),
+                generate_study_aid_text,
+                request.topic,
+                request.aid_type
+            )
         
         # Return the response
         return StudyAidResponse(
@@ -249,19 +274,34 @@ async def generate_study_aid(request: StudyAidRequest):
             aid_type=request.aid_type,
             topic=request.topic
         )
+    except SchedulerTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating study aid: {str(e)}")
     
 
     
-@app.get("/aid-types")
+@router.post("/jobs/generate-study-aid", response_model=JobSubmitted, status_code=202)
+async def submit_study_aid_job(request: StudyAidRequest):
+    """
+    Queue study aid generation in the background and return a job id.
+    
+    Poll `/jobs/{job_id}` for progress and fetch `/jobs/{job_id}/result` when it has succeeded.
+    """
+    if not request.topic.strip():
+        raise HTTPException(status_code=400, detail="Topic cannot be empty")
+    
+    job_id = get_job_manager().submit("study-aid", {"topic": request.topic, "aid_type": request.aid_type})
+    return JobSubmitted(job_id=job_id, status="queued")
+
+@router.get("/aid-types")
 async def get_aid_types():
     """Get all available study aid types"""
     return {
         "aid_types": [aid_type.value for aid_type in StudyAidType]
     }
 
-@app.get("/")
+@router.get("/")
 async def root():
     """Root endpoint to check if the API is running"""
     return {
@@ -271,7 +311,42 @@ async def root():
         "available_aid_types": [aid_type.value for aid_type in StudyAidType]
     }
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_jobs()
+    yield
+
+def create_app():
+    """Build the study aid app; crewai and the job pool are only loaded when needed"""
+    # Initialize FastAPI app
+    app = FastAPI(
+        title="Study Aid Generator API",
+        description="An API that generates different types of study aids for various academic topics",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    
+    # Added before CORS so shed requests still carry CORS headers
+    admit_requests(app, ADMISSION_COSTS)
+    
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allows all origins
+        allow_credentials=True,
+        allow_methods=["*"],  # Allows all methods
+        allow_headers=["*"],  # Allows all headers
+        expose_headers=[TRACE_HEADER, "Retry-After"],
+    )
+    
+    instrument_app(app, "sos_exam_prep")
+    app.include_router(router)
+    app.include_router(create_job_router("study-aid"))
+    return app
+
+app = create_app()
 
-import uvicorn
+if __name__ == "__main__":
+    import uvicorn
     # Run the FastAPI app with uvicorn
-uvicorn.run(app, host="localhost", port=8006)
+    uvicorn.run(app, host="localhost", port=8006)
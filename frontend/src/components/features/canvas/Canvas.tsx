@@ -4,6 +4,7 @@ import axios from 'axios';
 import * as React from 'react';
 
 interface GeneratedResult {
+  expr?: string;
   solution: string | null;
   steps: Array<string>;
   explanation: string;
@@ -84,13 +85,12 @@ const Canvas: React.FC = () => {
   const [dictOfVars, setDictOfVars] = useState<Record<string, any>>({});
   const [isEraser, setIsEraser] = useState<boolean>(false);
   const [selectedAction, setSelectedAction] = useState<string>("Mathematics");
-  const [answer, setAnswer] = useState<{
+  // One answer per expression on the canvas
+  const [answers, setAnswers] = useState<Array<{
+    expr?: string;
     result: string | null;
     steps: string[];
-  }>({
-    result: null,
-    steps: [],
-  });
+  }>>([]);
   
   const SWATCHES: string[] = ['#ffffff', '#ff0000', '#00ff00', '#0000ff', '#ffff00'];
 
@@ -196,10 +196,13 @@ const Canvas: React.FC = () => {
 
       const data = await response.json();
 
-      setAnswer({
-        result: data.data[0]["explanation"],
-        steps: data.data[0]["steps"],
-      });
+      setAnswers(
+        data.data.map((item: GeneratedResult) => ({
+          expr: item.expr,
+          result: item.explanation,
+          steps: item.steps || [],
+        }))
+      );
     } catch (error) {
       console.error("Error processing image:", error);
     }
@@ -273,23 +276,31 @@ const Canvas: React.FC = () => {
         <div className="w-80 bg-gray-800 p-4 overflow-y-auto text-white">
           <h2 className="text-xl font-semibold mb-4 text-cyan-400">Analysis Results</h2>
           
-          {answer.steps.length > 0 && (
-            <div className="mb-4">
-              <h3 className="text-lg font-medium mb-2">Solution Steps:</h3>
-              <ol className="list-decimal pl-4 space-y-2">
-                {answer.steps.map((step, index) => (
-                  <li key={index}>{step}</li>
-                ))}
-              </ol>
-            </div>
-          )}
-          
-          {answer.result && (
-            <div className="mt-4">
-              <h3 className="text-lg font-medium mb-2">Final Result:</h3>
-              <p className="text-cyan-400">{answer.result}</p>
+          {answers.map((answer, answerIndex) => (
+            <div key={answerIndex} className="mb-6">
+              {answers.length > 1 && answer.expr && (
+                <h3 className="text-lg font-medium mb-2 text-cyan-300">{answer.expr}</h3>
+              )}
+              
+              {answer.steps.length > 0 && (
+                <div className="mb-4">
+                  <h3 className="text-lg font-medium mb-2">Solution Steps:</h3>
+                  <ol className="list-decimal pl-4 space-y-2">
+                    {answer.steps.map((step, index) => (
+                      <li key={index}>{step}</li>
+                    ))}
+                  </ol>
+                </div>
+              )}
+              
+              {answer.result && (
+                <div className="mt-4">
+                  <h3 className="text-lg font-medium mb-2">Final Result:</h3>
+                  <p className="text-cyan-400">{answer.result}</p>
+                </div>
+              )}
             </div>
-          )}
+          ))}
         </div>
       </div>
     </div>